@@ -0,0 +1,413 @@
+"""Cache sur disque des dataframes traitées"""
+
+# Import les modules utilisés
+import os
+import json
+import types
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+
+
+# Formats de fichiers supportés
+FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+
+
+def file_signature(path):
+    """
+    Renvoie la signature d'un fichier (chemin absolu, taille et date de modification).
+
+    Args:
+        path (str): Chemin du fichier.
+
+    Returns:
+        dict: Dictionnaire avec les clés `path`, `size` et `mtime`.
+    """
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+
+
+def step_name(func):
+    """Renvoie le nom complet d'une fonction (`module.nom`)."""
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _key_default(obj):
+    """Sérialise les paramètres qui ne sont pas des types `json` de façon stable entre deux sessions."""
+    if hasattr(obj, "cache_token"):
+        return {"class": step_name(type(obj)), "token": obj.cache_token()}
+    if isinstance(obj, (types.FunctionType, types.BuiltinFunctionType, type)):
+        if "<" not in obj.__qualname__:
+            # Fonction ou classe définie au niveau d'un module (pas une `lambda`)
+            return step_name(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(
+        f"{obj!r} ne peut pas servir de clé de cache : "
+        "donner à sa classe une méthode 'cache_token' qui renvoie une valeur stable"
+    )
+
+
+def key_hash(obj):
+    """
+    Renvoie le hash d'un objet `json` (paramètres d'étapes, signatures de fichiers, ...).
+
+    Les objets qui ne sont pas des types `json` doivent avoir une méthode `cache_token`
+    qui renvoie une valeur `json` stable entre deux sessions (par exemple le chemin d'un fichier).
+    Les fonctions sont représentées par leur nom complet.
+    Les autres objets lèvent `TypeError` : leur représentation contient souvent leur adresse
+    en mémoire, et la clé changerait à chaque session.
+
+    Args:
+        obj: L'objet à hasher.
+
+    Returns:
+        str: Le hash sha1 en hexadécimal.
+    """
+    key_json = json.dumps(obj, sort_keys=True, default=_key_default)
+
+    return hashlib.sha1(key_json.encode("utf-8")).hexdigest()
+
+
+def cache_key(path, steps):
+    """
+    Calcule la clé de cache d'un fichier et d'une suite d'étapes.
+
+    La clé change dès que le fichier (taille ou date de modification),
+    le nom d'une étape ou un de ses paramètres change.
+
+    Args:
+        path (str): Chemin du fichier d'entrée.
+
+        steps (list): Liste de tuples `(nom de l'étape, dictionnaire des paramètres)`.    
+            Les paramètres qui sont des objets doivent avoir une méthode `cache_token` (voir `key_hash`).
+
+    Returns:
+        str: La clé (hash sha1 en hexadécimal).
+    """
+    key = {"file": file_signature(path), "steps": [list(step) for step in steps]}
+
+    return key_hash(key)
+
+
+def cache_path(cache_dir, key, fmt="parquet"):
+    """Renvoie le chemin du fichier de cache associé à `key`."""
+    assert fmt in FORMATS, f"'fmt' doit être dans {list(FORMATS)}"
+    return os.path.join(cache_dir, key + FORMATS[fmt])
+
+
+# Clé des métadonnées qui liste les colonnes enregistrées en json
+JSON_COLUMNS = b"projet_json_columns"
+
+# Valeurs que Parquet et Feather ne relisent pas à l'identique
+_NESTED = (list, tuple, dict, np.ndarray)
+
+
+def _json_default(obj):
+    """Convertit les types numpy pour `json.dumps`."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj)} ne peut pas être enregistré dans le cache")
+
+
+def _to_table(df):
+    """
+    Convertit une dataframe en table `pyarrow`.
+
+    Les colonnes qui contiennent des listes ou des dictionnaires (par exemple
+    `place-bounding_box-coordinates`) sont enregistrées en json, valeur par valeur :
+    sinon elles seraient relues comme des `numpy.ndarray` imbriqués, avec `None` au lieu de `NaN`.
+    """
+    nested = [
+        col
+        for col in df.columns
+        if df[col].dtype == object
+        and any(isinstance(value, _NESTED) for value in df[col])
+    ]
+    if nested:
+        df = df.copy()
+        for col in nested:
+            df[col] = [json.dumps(value, default=_json_default) for value in df[col]]
+
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[JSON_COLUMNS] = json.dumps(nested).encode("utf-8")
+    return table.replace_schema_metadata(metadata)
+
+
+def _from_table(table):
+    """Convertit une table créée par `_to_table` en dataframe."""
+    df = table.to_pandas()
+    metadata = table.schema.metadata or {}
+    for col in json.loads(metadata.get(JSON_COLUMNS, b"[]")):
+        df[col] = pd.Series(
+            [json.loads(value) for value in df[col]], index=df.index, dtype=object
+        )
+    return df
+
+
+def save_cache(df, cache_dir, key, fmt="parquet"):
+    """
+    Enregistre une dataframe dans le cache au format colonne.
+
+    Les colonnes de listes ou de dictionnaires sont enregistrées en json
+    pour être relues à l'identique par `load_cache`.
+
+    Args:
+        df (pandas.dataframe): La dataframe à enregistrer.
+
+        cache_dir (str): Le dossier du cache.
+
+        key (str): La clé de cache, par exemple créée par `cache_key`.
+
+        fmt (str, optional): Le format du fichier, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+    Returns:
+        str: Le chemin du fichier créé.
+    """
+    path = cache_path(cache_dir, key, fmt=fmt)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Écrit dans un fichier temporaire pour ne jamais laisser de cache à moitié écrit
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        pq.write_table(_to_table(df), tmp_path)
+    else:
+        # Le format feather ne garde pas l'index
+        feather.write_feather(_to_table(df.reset_index()), tmp_path)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_cache(cache_dir, key, fmt="parquet"):
+    """
+    Charge une dataframe depuis le cache.
+
+    Args:
+        cache_dir (str): Le dossier du cache.
+
+        key (str): La clé de cache.
+
+        fmt (str, optional): Le format du fichier, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+    Returns:
+        pandas.dataframe: La dataframe, ou `None` si elle n'est pas dans le cache.
+    """
+    path = cache_path(cache_dir, key, fmt=fmt)
+    if not os.path.isfile(path):
+        return None
+
+    if fmt == "parquet":
+        return _from_table(pq.read_table(path))
+
+    df = _from_table(feather.read_table(path))
+    df = df.set_index(df.columns[0])
+    if df.index.name == "index":
+        df.index.name = None
+    return df
+
+
+# Jeu de données incrémental
+MANIFEST = "manifest.json"
+
+
+def load_manifest(store_dir):
+    """
+    Charge le manifeste d'un jeu de données incrémental.
+
+    Args:
+        store_dir (str): Le dossier du jeu de données.
+
+    Returns:
+        dict: Dictionnaire avec les clés `files` (position déjà traitée de chaque fichier),
+            `parts` (liste des parties du jeu de données)
+            et éventuellement `signatures` (taille et date de modification des fichiers compressés lus).
+    """
+    path = os.path.join(store_dir, MANIFEST)
+    if not os.path.isfile(path):
+        return {"files": {}, "parts": []}
+
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+
+def save_manifest(manifest, store_dir):
+    """Enregistre le manifeste d'un jeu de données incrémental."""
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_part(df, store_dir, manifest, fmt="parquet"):
+    """
+    Ajoute une partie au jeu de données et l'inscrit dans `manifest`.
+
+    Le manifeste doit ensuite être enregistré avec `save_manifest`.
+
+    Returns:
+        str: Le nom de la partie.
+    """
+    part = "part-%05d" % len(manifest["parts"])
+    save_cache(df, store_dir, part, fmt=fmt)
+    manifest["parts"].append(part)
+
+    return part
+
+
+def load_dataset(store_dir, fmt="parquet"):
+    """
+    Charge toutes les parties d'un jeu de données incrémental.
+
+    Seules les parties inscrites dans le manifeste sont lues.
+
+    Args:
+        store_dir (str): Le dossier du jeu de données.
+
+        fmt (str, optional): Le format des parties, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+    Returns:
+        pandas.dataframe: Le jeu de données, ou `None` s'il est vide.
+    """
+    parts = load_manifest(store_dir)["parts"]
+    if not parts:
+        return None
+
+    return pd.concat([load_cache(store_dir, part, fmt=fmt) for part in parts])
+
+
+def iter_dataset(store_dir, fmt="parquet"):
+    """
+    Lit une à une les parties d'un jeu de données incrémental.
+
+    Contrairement à `load_dataset`, une seule partie est en mémoire à la fois.
+
+    Yields:
+        pandas.dataframe: Chaque partie, dans l'ordre du manifeste.
+    """
+    for part in load_manifest(store_dir)["parts"]:
+        yield load_cache(store_dir, part, fmt=fmt)
+
+
+# Jeu de données partitionné par date
+PARTITIONS = "partitions.json"
+
+
+def load_partitions(store_dir):
+    """
+    Charge l'index d'un jeu de données partitionné par date.
+
+    Args:
+        store_dir (str): Le dossier du jeu de données.
+
+    Returns:
+        dict: Dictionnaire avec les clés `date_var`, `freq` et `partitions`
+            (intervalle `[début, fin)` de chaque partition, au format ISO).
+    """
+    path = os.path.join(store_dir, PARTITIONS)
+    if not os.path.isfile(path):
+        return {"date_var": None, "freq": None, "partitions": {}}
+
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+
+def save_by_date(df, store_dir, date_var="created_at", freq="D", fmt="parquet"):
+    """
+    Enregistre une dataframe dans un jeu de données partitionné par date.
+
+    Chaque partition contient les tweets d'une période de durée `freq`, triés par date.    
+    Les tweets d'une période déjà enregistrée sont ajoutés à sa partition.    
+    Les tweets sans date sont ignorés.
+
+    Args:
+        df (pandas.dataframe): La dataframe à enregistrer.
+
+        store_dir (str): Le dossier du jeu de données.
+
+        date_var (str, optional): Le nom de la colonne qui contient la date (au format datetime).    
+            Par défaut : `"created_at"`.
+
+        freq (str, optional): La durée des partitions, au format de `pandas` (`"D"`, `"H"`, ...).    
+            Par défaut : `"D"`.
+
+        fmt (str, optional): Le format des partitions, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+    Returns:
+        list: Les noms des partitions écrites.
+    """
+    index = load_partitions(store_dir)
+    if index["partitions"]:
+        assert (
+            index["date_var"] == date_var and index["freq"] == freq
+        ), f"Le jeu de données est partitionné par '{index['date_var']}' et '{index['freq']}'"
+    index["date_var"] = date_var
+    index["freq"] = freq
+    period = pd.tseries.frequencies.to_offset(freq)
+
+    names = []
+    for bucket, part in df.groupby(df[date_var].dt.floor(freq), sort=True):
+        name = "date=" + bucket.strftime("%Y%m%dT%H%M%S")
+        if name in index["partitions"]:
+            part = pd.concat([load_cache(store_dir, name, fmt=fmt), part])
+        part = part.sort_values(date_var, kind="mergesort")
+        save_cache(part, store_dir, name, fmt=fmt)
+        index["partitions"][name] = [bucket.isoformat(), (bucket + period).isoformat()]
+        names.append(name)
+
+    # L'index est écrit après les partitions
+    path = os.path.join(store_dir, PARTITIONS)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(index, fh, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+    return names
+
+
+def partitions_in_range(store_dir, start=None, end=None):
+    """
+    Renvoie les partitions qui contiennent des dates entre `start` et `end`, dans l'ordre chronologique.
+
+    Args:
+        store_dir (str): Le dossier du jeu de données.
+
+        start (str, optional): La date de départ.    
+            Par défaut : `None` (pas de limite).
+
+        end (str, optional): La date de fin.    
+            Par défaut : `None` (pas de limite).
+
+    Returns:
+        list: Les noms des partitions.
+    """
+    start = None if start is None else pd.to_datetime(start)
+    end = None if end is None else pd.to_datetime(end)
+
+    bounds = [
+        (pd.to_datetime(first), pd.to_datetime(last), name)
+        for name, (first, last) in load_partitions(store_dir)["partitions"].items()
+    ]
+    return [
+        name
+        for first, last, name in sorted(bounds)
+        if (start is None or last > start) and (end is None or first < end)
+    ]
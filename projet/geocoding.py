@@ -0,0 +1,464 @@
+"""Géocodage des villes (gazetteer local et cache des requêtes en ligne)"""
+
+# Import les modules utilisés
+import os
+import re
+import time
+import asyncio
+import functools
+import concurrent.futures
+import sqlite3
+import numpy as np
+import pandas as pd
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited
+
+
+# Nombre maximal de paramètres par requête SQL
+_SQL_BATCH = 500
+
+# Expression pour trouver l'état dans l'adresse renvoyée par Nominatim
+_STATE_EXPR = re.compile(", .*, (.*), United States")
+
+# Erreurs pour lesquelles la requête est réessayée
+_RETRY_ERRORS = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+
+def location_to_tuple(loc):
+    """
+    Convertit la réponse de geopy en tuple `(état, latitude, longitude)`.
+
+    L'état vaut `np.nan` si l'adresse n'est pas aux États-Unis.
+
+    Args:
+        loc (geopy.location.Location): La réponse du géocodeur, ou `None`.
+
+    Returns:
+        tuple: Le tuple `(état, latitude, longitude)`, ou `None` si `loc` est `None`.
+    """
+    if not loc:
+        return None
+    l_state = _STATE_EXPR.findall(loc.address)
+    st = l_state[0] if l_state else np.nan
+    return st, loc.latitude, loc.longitude
+
+
+def build_gazetteer(
+    csv_path,
+    db_path,
+    city_col="city",
+    state_col="state_name",
+    lat_col="lat",
+    lon_col="lng",
+    population_col=None,
+    chunksize=100000,
+):
+    """
+    Crée le gazetteer local (base SQLite indexée) à partir d'un fichier `.csv` de villes américaines.
+
+    Par exemple, le fichier `uscities.csv` de [simplemaps](https://simplemaps.com/data/us-cities)
+    a les colonnes par défaut.
+
+    Args:
+        csv_path (str): Chemin du fichier `.csv`.
+
+        db_path (str): Chemin de la base SQLite à créer (remplacée si elle existe).
+
+        city_col (str, optional): Nom de la colonne des villes.    
+            Par défaut : `"city"`.
+
+        state_col (str, optional): Nom de la colonne des états.    
+            Par défaut : `"state_name"`.
+
+        lat_col (str, optional): Nom de la colonne des latitudes.    
+            Par défaut : `"lat"`.
+
+        lon_col (str, optional): Nom de la colonne des longitudes.    
+            Par défaut : `"lng"`.
+
+        population_col (str, optional): Nom de la colonne de la population.    
+            Si plusieurs villes ont le même nom, la plus peuplée est choisie.    
+            Par défaut : `None` (la première du fichier).
+
+        chunksize (int, optional): Nombre de lignes lues à la fois.    
+            Par défaut : `100000`.
+
+    Returns:
+        Gazetteer: Le gazetteer créé.
+    """
+    if os.path.isfile(db_path):
+        os.remove(db_path)
+
+    usecols = [city_col, state_col, lat_col, lon_col]
+    if population_col:
+        usecols.append(population_col)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE cities "
+            "(key TEXT, city TEXT, state TEXT, lat REAL, lon REAL, population REAL)"
+        )
+        for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize):
+            chunk = chunk.dropna(subset=[city_col])
+            rows = zip(
+                chunk[city_col].str.lower(),
+                chunk[city_col],
+                chunk[state_col],
+                chunk[lat_col],
+                chunk[lon_col],
+                chunk[population_col] if population_col else [0] * len(chunk),
+            )
+            conn.executemany("INSERT INTO cities VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("CREATE INDEX cities_key ON cities (key)")
+
+    return Gazetteer(db_path)
+
+
+class Gazetteer:
+    def __init__(self, db_path):
+        """
+        Classe qui associe hors ligne une ville américaine à son état et ses coordonnées.
+
+        S'appuie sur une base SQLite indexée par le nom de la ville, créée par `build_gazetteer`.
+        Les réponses sont gardées en mémoire.
+
+        Args:
+            db_path (str): Chemin de la base SQLite.
+
+        Attributes:
+            db_path (str): Contient le chemin de la base.
+            conn (sqlite3.Connection): Contient la connexion à la base.
+            memo (dict): Contient les réponses déjà calculées.
+        """
+        assert os.path.isfile(
+            db_path
+        ), f"'{db_path}' n'existe pas, voir 'build_gazetteer'"
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.memo = {}
+
+    def cache_token(self):
+        """Renvoie la clé de cache : le chemin, la taille et la date de modification de la base."""
+        stat = os.stat(self.db_path)
+        return [os.path.abspath(self.db_path), stat.st_size, stat.st_mtime]
+
+    def lookup_many(self, cities):
+        """
+        Cherche plusieurs villes dans le gazetteer en quelques requêtes.
+
+        Args:
+            cities (iterable): Les noms des villes.
+
+        Returns:
+            dict: Associe à chaque ville un tuple `(état, latitude, longitude)`,
+                ou `None` si elle n'est pas dans le gazetteer.
+        """
+        keys = {city: city.lower() for city in cities}
+        missing = list({key for key in keys.values() if key not in self.memo})
+
+        for i in range(0, len(missing), _SQL_BATCH):
+            batch = missing[i : i + _SQL_BATCH]
+            # SQLite renvoie les autres colonnes de la ligne où la population est maximale
+            query = (
+                "SELECT key, state, lat, lon, MAX(population) FROM cities "
+                f"WHERE key IN ({', '.join('?' * len(batch))}) GROUP BY key"
+            )
+            for key, state, lat, lon, _ in self.conn.execute(query, batch):
+                self.memo[key] = (state, lat, lon)
+            for key in batch:
+                self.memo.setdefault(key, None)
+
+        return {city: self.memo[key] for city, key in keys.items()}
+
+    def lookup(self, city):
+        """Renvoie le tuple `(état, latitude, longitude)` de `city`, ou `None`."""
+        return self.lookup_many([city])[city]
+
+    def close(self):
+        """Ferme la connexion à la base."""
+        self.conn.close()
+
+
+class GeocodeCache:
+    def __init__(self, db_path):
+        """
+        Cache persistant (base SQLite) des réponses des requêtes de géocodage en ligne.
+
+        Les villes introuvables sont aussi gardées pour ne pas refaire la requête.
+
+        Args:
+            db_path (str): Chemin de la base SQLite (créée si elle n'existe pas).
+
+        Attributes:
+            db_path (str): Contient le chemin de la base.
+            conn (sqlite3.Connection): Contient la connexion à la base.
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode "
+            "(query TEXT PRIMARY KEY, found INTEGER, state TEXT, lat REAL, lon REAL)"
+        )
+        self.conn.commit()
+
+    def cache_token(self):
+        """Renvoie la clé de cache : le chemin de la base, dont le contenu grandit à chaque requête."""
+        return os.path.abspath(self.db_path)
+
+    def __contains__(self, query):
+        row = self.conn.execute(
+            "SELECT 1 FROM geocode WHERE query = ?", (query,)
+        ).fetchone()
+        return row is not None
+
+    def __getitem__(self, query):
+        row = self.conn.execute(
+            "SELECT found, state, lat, lon FROM geocode WHERE query = ?", (query,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(query)
+        return tuple(row[1:]) if row[0] else None
+
+    def __setitem__(self, query, value):
+        found = value is not None
+        state, lat, lon = value if found else (None, None, None)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)",
+            (query, int(found), state, lat, lon),
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    def close(self):
+        """Ferme la connexion à la base."""
+        self.conn.close()
+
+
+class TokenBucket:
+    def __init__(self, rate=1.0, capacity=1):
+        """
+        Limiteur de débit (token bucket) pour `asyncio`.
+
+        Args:
+            rate (float, optional): Nombre de jetons ajoutés par seconde.    
+                Par défaut : `1.0` (limite d'usage de Nominatim).
+
+            capacity (int, optional): Nombre maximal de jetons (taille des rafales).    
+                Par défaut : `1`.
+
+        Attributes:
+            rate (float): Contient le nombre de jetons par seconde.
+            capacity (int): Contient le nombre maximal de jetons.
+            tokens (float): Contient le nombre de jetons disponibles.
+        """
+        assert rate > 0, "'rate' doit être positif"
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AsyncGeocoder:
+    def __init__(
+        self,
+        geolocator=None,
+        max_concurrency=4,
+        rate=1.0,
+        max_retries=3,
+        backoff=1.0,
+        cache=None,
+        verbose=False,
+        **kwargs,
+    ):
+        """
+        Géocodeur concurrent basé sur `asyncio`, avec limite de débit et reprises.
+
+        Les requêtes de `geolocator` (bloquantes) sont lancées dans des threads,
+        au plus `max_concurrency` à la fois et au plus `rate` par seconde.    
+        Une même ville n'est demandée qu'une fois, même si plusieurs requêtes sont en cours.    
+        Les requêtes qui échouent (timeout, service indisponible) sont réessayées
+        avec une attente exponentielle.
+
+        Args:
+            geolocator (optional): Le géocodeur geopy à utiliser.    
+                Par défaut : `Nominatim(timeout=2, user_agent="projet-python-twitter")`.
+
+            max_concurrency (int, optional): Nombre maximal de requêtes simultanées.    
+                Par défaut : `4`.
+
+            rate (float, optional): Nombre maximal de requêtes par seconde.    
+                Par défaut : `1.0`.
+
+            max_retries (int, optional): Nombre de nouvelles tentatives après un échec.    
+                Par défaut : `3`.
+
+            backoff (float, optional): Attente (en secondes) avant la première nouvelle tentative,
+                doublée à chaque échec.    
+                Par défaut : `1.0`.
+
+            cache (GeocodeCache, optional): Cache persistant des réponses.    
+                Par défaut : `None`.
+
+            verbose (bool, optional): Si `True`, affiche les requêtes qui ont échoué.    
+                Par défaut : `False`.
+
+            **kwargs (optional): Arguments à passer à `geolocator.geocode`.    
+                Par défaut : `language="en-US"`.
+
+        Attributes:
+            geolocator: Contient le géocodeur geopy.
+            bucket (TokenBucket): Contient le limiteur de débit.
+            results (dict): Contient les réponses déjà obtenues.
+            failed (list): Contient les villes dont toutes les tentatives ont échoué.
+            n_requests (int): Compteur du nombre de requêtes envoyées.
+        """
+        self.geolocator = geolocator or Nominatim(
+            timeout=2, user_agent="projet-python-twitter"
+        )
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate=rate)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self.verbose = verbose
+        self.kwargs = kwargs or {"language": "en-US"}
+        self.results = {}
+        self.failed = []
+        self.n_requests = 0
+        self._pending = {}
+        self._semaphore = None
+        self._executor = None
+
+    def cache_token(self):
+        """Renvoie la clé de cache : le type de géocodeur et les arguments des requêtes."""
+        geolocator = type(self.geolocator)
+        return [f"{geolocator.__module__}.{geolocator.__qualname__}", self.kwargs]
+
+    async def _fetch(self, query):
+        loop = asyncio.get_event_loop()
+        geocode = functools.partial(self.geolocator.geocode, query, **self.kwargs)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.bucket.acquire()
+                self.n_requests += 1
+                try:
+                    loc = await loop.run_in_executor(self._executor, geocode)
+                    return location_to_tuple(loc), True
+                except _RETRY_ERRORS as e:
+                    if attempt == self.max_retries:
+                        if self.verbose:
+                            print(f"Error: geocode failed on input {query}: {e}")
+                        return None, False
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def geocode(self, query):
+        """
+        Géocode une ville (coroutine).
+
+        Returns:
+            tuple: Le tuple `(état, latitude, longitude)`, ou `None`.
+        """
+        if query in self.results:
+            return self.results[query]
+        if self.cache is not None and query in self.cache:
+            self.results[query] = self.cache[query]
+            return self.results[query]
+
+        # Une seule requête par ville, même si plusieurs sont en attente
+        if query not in self._pending:
+            self._pending[query] = asyncio.ensure_future(self._fetch(query))
+        result, ok = await self._pending[query]
+        if query in self._pending:
+            del self._pending[query]
+            if ok:
+                self.results[query] = result
+                if self.cache is not None:
+                    self.cache[query] = result
+            else:
+                self.failed.append(query)
+
+        return result
+
+    async def geocode_many(self, queries):
+        """
+        Géocode plusieurs villes de façon concurrente (coroutine).
+
+        Returns:
+            dict: Associe à chaque ville le tuple `(état, latitude, longitude)`, ou `None`.
+        """
+        queries = list(dict.fromkeys(queries))
+        # Les verrous sont liés à la boucle en cours
+        self.bucket._lock = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.max_concurrency)
+        try:
+            results = await asyncio.gather(*[self.geocode(query) for query in queries])
+        finally:
+            self._executor.shutdown(wait=False)
+
+        return dict(zip(queries, results))
+
+    def run(self, queries):
+        """
+        Géocode plusieurs villes et attend le résultat.
+
+        Fonctionne aussi dans un notebook, où une boucle `asyncio` tourne déjà :
+        les requêtes sont alors lancées dans une nouvelle boucle, dans un autre thread.
+        La connexion SQLite du cache ne pouvant servir que dans le thread qui l'a créée,
+        le cache est lu avant de lancer cette boucle et complété après.
+
+        Returns:
+            dict: Associe à chaque ville le tuple `(état, latitude, longitude)`, ou `None`.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.geocode_many(queries))
+
+        queries = list(dict.fromkeys(queries))
+        cache = self.cache
+        if cache is not None:
+            for query in queries:
+                if query not in self.results and query in cache:
+                    self.results[query] = cache[query]
+        results = {
+            query: self.results[query] for query in queries if query in self.results
+        }
+        missing = [query for query in queries if query not in results]
+
+        # Une boucle tourne déjà (notebook) : on lance une nouvelle boucle dans un thread
+        self.cache = None
+        try:
+            with concurrent.futures.ThreadPoolExecutor(1) as executor:
+                results.update(
+                    executor.submit(asyncio.run, self.geocode_many(missing)).result()
+                )
+        finally:
+            self.cache = cache
+
+        if cache is not None:
+            for query in missing:
+                # Seules les requêtes réussies sont dans `results`
+                if query in self.results:
+                    cache[query] = self.results[query]
+
+        return {query: results[query] for query in queries}
@@ -1,18 +1,32 @@
 """Modélisattion sur les données"""
 
 # Import les modules utilisés
+import os
+import json
+import time
+import hashlib
+import warnings
+import multiprocessing
+import functools
 import pandas as pd
 import numpy as np
 import nltk
 import sklearn
+import joblib
 import matplotlib.pyplot as plt
 from kneed import KneeLocator
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
 from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
 
 # Import les utils du projet
 import projet.projet_utils as utils
+import projet.cache as cache
+
+
+# Algorithmes de clustering disponibles
+BACKENDS = {"kmeans": KMeans, "minibatch": MiniBatchKMeans}
 
 
 # Fonctions pour le K-means
@@ -31,11 +45,296 @@ def standardize(df, vars):
     Returns:
         pandas.dataframe: Une df normalisée.
     """
-    new_df = df[vars].astype(float)
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(new_df)
+    features = FeatureMatrix(vars, dtype=np.float64)
+    return pd.DataFrame(features.fit_transform(df), columns=list(vars))
+
+
+class FeatureMatrix:
+    def __init__(self, vars, dtype=np.float32):
+        """
+        Classe qui construit la matrice des variables normalisées, utilisée par le K-means.
+
+        Les variables sont copiées une seule fois dans un tableau `numpy` contigu de type `dtype`,
+        puis normalisées sur place.    
+        La normalisation apprise par `fit_transform` est gardée :
+        `transform` normalise les nouveaux paquets sans la réapprendre.
+
+        Args:
+            vars (list): Liste des noms des variables.
+
+            dtype (numpy.dtype, optional): Le type du tableau.    
+                `float32` divise la mémoire par deux par rapport à `float64`.    
+                Par défaut : `numpy.float32`.
+
+        Attributes:
+            vars (list): Contient les noms des variables.
+            dtype (numpy.dtype): Contient le type du tableau.
+            scaler (sklearn.preprocessing.StandardScaler): Contient la normalisation,
+                `None` avant `fit_transform`.
+        """
+        self.vars = list(vars)
+        self.dtype = np.dtype(dtype)
+        self.scaler = None
+
+    def to_array(self, df):
+        """Copie les variables de `df` dans un tableau contigu, sans normalisation."""
+        X = np.empty((len(df), len(self.vars)), dtype=self.dtype)
+        for j, var in enumerate(self.vars):
+            X[:, j] = df[var].to_numpy(dtype=self.dtype, na_value=np.nan)
+        return X
+
+    def fit_transform(self, df):
+        """
+        Apprend la normalisation sur `df` et renvoie la matrice normalisée.
+
+        Returns:
+            numpy.ndarray: La matrice, de forme `(len(df), len(vars))`.
+        """
+        X = self.to_array(df)
+        self.scaler = StandardScaler(copy=False).fit(X)
+        return self.scaler.transform(X, copy=False)
+
+    def transform(self, df):
+        """
+        Renvoie la matrice normalisée de `df` avec la normalisation déjà apprise.
+
+        Returns:
+            numpy.ndarray: La matrice, de forme `(len(df), len(vars))`.
+        """
+        assert self.scaler is not None, "Appeler 'fit_transform' d'abord"
+        return self.scaler.transform(self.to_array(df), copy=False)
+
+
+# Données partagées par les processus de la recherche du nombre de clusters
+_X = None
+
+
+def _init_worker(X):
+    """Garde les données dans le processus et limite sklearn à un seul thread."""
+    global _X
+    _X = X
+    threadpool_limits(1)
+
+
+def _fit_kmeans(k, kmeans_kwargs, X=None, backend="kmeans"):
+    """
+    Entraîne un `KMeans` (ou un `MiniBatchKMeans`) à `k` clusters.
 
-    return pd.DataFrame(scaled_features, columns=new_df.columns)
+    Returns:
+        tuple: (Le modèle entraîné, Le temps d'entraînement en secondes).
+    """
+    start = time.perf_counter()
+    kmeans = BACKENDS[backend](n_clusters=k, **kmeans_kwargs)
+    kmeans.fit(_X if X is None else X)
+    return kmeans, time.perf_counter() - start
+
+
+def elbow_search(X, max_cluster=10, n_jobs=None, backend="kmeans", **kmeans_kwargs):
+    """
+    Entraîne un `KMeans` pour chaque nombre de clusters de 1 à `max_cluster`
+    et choisit le nombre optimal par la méthode du coude.
+
+    Les nombres de clusters sont répartis entre `n_jobs` processus.
+
+    Args:
+        X (array): Les données (déjà normalisées).
+
+        max_cluster (int, optional): Nombre maximal de clusters.    
+            Par défaut : `10`.
+
+        n_jobs (int, optional): Nombre de processus.    
+            Mettre `-1` pour utiliser tous les coeurs.    
+            Par défaut : `None` (un seul processus).
+
+        backend (str, optional): `"kmeans"` (`KMeans`) ou `"minibatch"` (`MiniBatchKMeans`).    
+            Par défaut : `"kmeans"`.
+
+        **kmeans_kwargs: Arguments à passer à `KMeans` ou `MiniBatchKMeans`.
+
+    Returns:
+        dict: Dictionnaire avec les clés `n_cluster` (nombre optimal de clusters),
+            `k`, `sse` et `fit_time` (une valeur par nombre de clusters)
+            et `models` (les modèles entraînés).
+    """
+    assert backend in BACKENDS, f"'backend' doit être dans {list(BACKENDS)}"
+    ks = list(range(1, max_cluster + 1))
+    n_jobs = min(utils.get_n_jobs(n_jobs), len(ks))
+    fit = functools.partial(_fit_kmeans, kmeans_kwargs=kmeans_kwargs, backend=backend)
+
+    if n_jobs > 1:
+        # Les plus grands `k` sont les plus longs : ils sont lancés en premier
+        with multiprocessing.Pool(
+            processes=n_jobs, initializer=_init_worker, initargs=(X,)
+        ) as pool:
+            results = pool.map(fit, ks[::-1], chunksize=1)[::-1]
+    else:
+        results = [fit(k, X=X) for k in ks]
+
+    models = [kmeans for kmeans, _ in results]
+    sse = [kmeans.inertia_ for kmeans in models]
+    kl = KneeLocator(ks, sse, curve="convex", direction="decreasing")
+
+    return {
+        # Sans coude visible, garde le plus grand nombre de clusters testé
+        "n_cluster": kl.elbow if kl.elbow is not None else max_cluster,
+        "k": ks,
+        "sse": sse,
+        "fit_time": [fit_time for _, fit_time in results],
+        "models": models,
+    }
+
+
+def stratified_sample(n, size, strata=None, random_state=None):
+    """
+    Tire un échantillon de `size` positions parmi `n`, stratifié selon `strata`.
+
+    Chaque strate garde (environ) sa proportion dans l'échantillon, avec au moins une ligne.
+
+    Args:
+        n (int): Nombre de lignes.
+
+        size (int): Taille de l'échantillon.
+
+        strata (array, optional): La strate de chaque ligne (par exemple l'État).    
+            Par défaut : `None` (échantillon aléatoire simple).
+
+        random_state (int or numpy.random.Generator, optional): Graine du générateur aléatoire.    
+            Par défaut : `None`.
+
+    Returns:
+        numpy.ndarray: Les positions des lignes tirées, triées.
+    """
+    rng = np.random.default_rng(random_state)
+    if size >= n:
+        return np.arange(n)
+    if strata is None:
+        return np.sort(rng.choice(n, size, replace=False))
+
+    codes, _ = pd.factorize(pd.Series(strata), use_na_sentinel=False)
+    order = np.argsort(codes, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(codes))[:-1])
+    sample = [
+        rng.choice(group, max(1, round(size * len(group) / n)), replace=False)
+        for group in groups
+    ]
+    return np.sort(np.concatenate(sample))
+
+
+def select_k(
+    X,
+    max_cluster=10,
+    n_samples=5,
+    sample_size=10000,
+    strata=None,
+    criterion="silhouette",
+    seed=40,
+    n_jobs=None,
+    backend="kmeans",
+    **kmeans_kwargs,
+):
+    """
+    Choisit le nombre de clusters sur des échantillons des données.
+
+    Sur chacun des `n_samples` échantillons (stratifiés selon `strata`),
+    la méthode du coude est appliquée (voir `elbow_search`)
+    et le score silhouette est calculé pour chaque nombre de clusters à partir de 2.    
+    Le nombre choisi est celui qui a le meilleur score silhouette moyen (`criterion="silhouette"`)
+    ou celui qui est le plus souvent choisi par la méthode du coude (`criterion="elbow"`).    
+    La confiance est la part des échantillons qui donnent le même nombre de clusters.
+
+    Le coût ne dépend que de `sample_size` : le score silhouette, en `O(n²)`,
+    n'est jamais calculé sur toutes les données.
+
+    Args:
+        X (array): Les données (déjà normalisées).
+
+        max_cluster (int, optional): Nombre maximal de clusters.    
+            Par défaut : `10`.
+
+        n_samples (int, optional): Nombre d'échantillons.    
+            Par défaut : `5`.
+
+        sample_size (int, optional): Taille de chaque échantillon.    
+            Par défaut : `10000`.
+
+        strata (array, optional): La strate de chaque ligne, voir `stratified_sample`.    
+            Par défaut : `None`.
+
+        criterion (str, optional): `"silhouette"` ou `"elbow"`.    
+            Par défaut : `"silhouette"`.
+
+        seed (int, optional): Graine du tirage des échantillons.    
+            Par défaut : `40`.
+
+        n_jobs, backend, **kmeans_kwargs: Voir `elbow_search`.
+
+    Returns:
+        dict: Dictionnaire avec les clés `n_cluster`, `confidence`, `k`,
+            `silhouette_mean` et `silhouette_std` (par nombre de clusters, `NaN` pour 1 cluster),
+            `sse_mean` (par nombre de clusters), `elbow_votes` et `silhouette_votes`
+            (nombre d'échantillons qui choisissent chaque nombre de clusters).
+    """
+    assert criterion in [
+        "silhouette",
+        "elbow",
+    ], "'criterion' doit être 'silhouette' ou 'elbow'"
+    assert max_cluster >= 2, "'max_cluster' doit être au moins 2"
+    rng = np.random.default_rng(seed)
+    ks = list(range(1, max_cluster + 1))
+
+    silhouettes = []
+    sses = []
+    elbows = []
+    for _ in range(n_samples):
+        sample = X[stratified_sample(len(X), sample_size, strata, random_state=rng)]
+        search = elbow_search(
+            sample,
+            max_cluster=max_cluster,
+            n_jobs=n_jobs,
+            backend=backend,
+            **kmeans_kwargs,
+        )
+        elbows.append(search["n_cluster"])
+        sses.append(search["sse"])
+        silhouettes.append(
+            [np.nan]
+            + [
+                silhouette_score(sample, kmeans.labels_)
+                if len(np.unique(kmeans.labels_)) > 1
+                else np.nan
+                for kmeans in search["models"][1:]
+            ]
+        )
+
+    silhouettes = np.array(silhouettes)
+    best = [
+        ks[np.nanargmax(row)] if not np.isnan(row).all() else 1 for row in silhouettes
+    ]
+    silhouette_votes = {k: best.count(k) for k in ks if k in best}
+    elbow_votes = {k: elbows.count(k) for k in ks if k in elbows}
+
+    # La silhouette n'est pas définie pour 1 cluster
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        silhouette_mean = np.nanmean(silhouettes, axis=0)
+        silhouette_std = np.nanstd(silhouettes, axis=0)
+    if criterion == "silhouette":
+        n_cluster = ks[1 + int(np.nanargmax(silhouette_mean[1:]))]
+        votes = silhouette_votes
+    else:
+        n_cluster = max(elbow_votes, key=lambda k: (elbow_votes[k], -k))
+        votes = elbow_votes
+
+    return {
+        "n_cluster": n_cluster,
+        "confidence": votes.get(n_cluster, 0) / n_samples,
+        "k": ks,
+        "silhouette_mean": list(silhouette_mean),
+        "silhouette_std": list(silhouette_std),
+        "sse_mean": list(np.mean(sses, axis=0)),
+        "elbow_votes": elbow_votes,
+        "silhouette_votes": silhouette_votes,
+    }
 
 
 def KM(
@@ -49,32 +348,130 @@ def KM(
     max_cluster=10,
     random_state=40,
     plot=False,
+    n_jobs=None,
+    return_info=False,
+    backend="kmeans",
+    batch_size=1024,
+    selection="elbow",
+    n_samples=5,
+    sample_size=10000,
+    strata_var=None,
+    dtype=np.float32,
+    model_path=None,
 ):
+    """
+    Ajoute les labels d'un K-means à la dataframe.
+
+    Si `n_cluster` est omis, il est choisi par la méthode du coude (voir `elbow_search`)
+    et le modèle déjà entraîné pour ce nombre de clusters est réutilisé.    
+    Avec `selection="sample"`, il est choisi sur des échantillons (voir `select_k`)
+    et seul le modèle final est entraîné sur toutes les données.
+
+    Args:
+        df (pandas.dataframe): La dataframe avec les données.
+
+        n_cluster (int, optional): Nombre de clusters.    
+            Par défaut : `None` (nombre optimal).
+
+        label_var (str, optional): Nom de la colonne des labels.    
+            Par défaut : `"kmlabel"`.
+
+        vars (list, optional): Liste des variables à utiliser.    
+            Par défaut : `None` (les variables numériques et booléennes, voir `get_numeric`).
+
+        drop_vars (list, optional): Variables à ne pas utiliser si `vars` est omis.    
+            Par défaut : `["user-id"]`.
+
+        n_init, max_iter, random_state: Arguments de `KMeans`.
+
+        max_cluster (int, optional): Nombre maximal de clusters de la méthode du coude.    
+            Par défaut : `10`.
+
+        plot (bool, optional): `True` pour afficher la courbe du SSE.    
+            Par défaut : `False`.
+
+        n_jobs (int, optional): Nombre de processus pour la méthode du coude.    
+            Mettre `-1` pour utiliser tous les coeurs.    
+            Par défaut : `None` (un seul processus).
+
+        return_info (bool, optional): `True` pour renvoyer aussi les informations du modèle.    
+            Par défaut : `False`.
+
+        backend (str, optional): `"kmeans"` (`KMeans`) ou `"minibatch"` (`MiniBatchKMeans`,
+            beaucoup plus rapide sur de grandes données).    
+            Par défaut : `"kmeans"`.
+
+        batch_size (int, optional): Taille des paquets de `MiniBatchKMeans`.    
+            Par défaut : `1024`.
+
+        selection (str, optional): Choix du nombre de clusters si `n_cluster` est omis :
+            `"elbow"` (méthode du coude sur toutes les données)
+            ou `"sample"` (silhouette et coude sur des échantillons, voir `select_k`).    
+            Par défaut : `"elbow"`.
+
+        n_samples, sample_size: Voir `select_k`.
+
+        strata_var (str, optional): Variable de `df` selon laquelle stratifier les échantillons.    
+            Par défaut : `None`.
 
+        dtype (numpy.dtype, optional): Le type de la matrice des variables, voir `FeatureMatrix`.    
+            Par défaut : `numpy.float32`.
+
+        model_path (str, optional): Fichier où enregistrer la normalisation et le modèle
+            (voir `ClusterModel`), pour étiqueter de nouveaux tweets sans réentraîner.    
+            Par défaut : `None` (pas d'enregistrement).
+
+    Returns:
+        pandas.dataframe: Modifie la dataframe d'entrée en ajoutant les labels et la renvoie.    
+            Si `return_info`, renvoie un tuple `(df, info)` où `info` est un dictionnaire
+            avec les clés `n_cluster`, `model`, `features` (la `FeatureMatrix`
+            et sa normalisation), et pour la méthode du coude
+            `k`, `sse` et `fit_time` (ou les clés de `select_k`).
+    """
     if vars is None:
         vars = get_numeric(df, drop_vars)
-    df2 = standardize(df, vars=vars)
+    features = FeatureMatrix(vars, dtype=dtype)
+    X = features.fit_transform(df)
 
+    assert backend in BACKENDS, f"'backend' doit être dans {list(BACKENDS)}"
     kmeans_kwargs = {
         "init": "random",
         "n_init": n_init,
         "max_iter": max_iter,
         "random_state": random_state,
     }
+    if backend == "minibatch":
+        kmeans_kwargs["batch_size"] = batch_size
 
-    # A list holds the SSE values for each k
-    if n_cluster is None:
-        sse = []
-        for k in range(1, max_cluster + 1):
-            kmeans = KMeans(n_clusters=k, **kmeans_kwargs)
-            kmeans.fit(df2)
-            sse.append(kmeans.inertia_)
-
-        kl = KneeLocator(
-            range(1, max_cluster + 1), sse, curve="convex", direction="decreasing"
+    assert selection in ["elbow", "sample"], "'selection' doit être 'elbow' ou 'sample'"
+    info = {}
+    if n_cluster is None and selection == "sample":
+        strata = None if strata_var is None else df[strata_var].to_numpy()
+        info = select_k(
+            X,
+            max_cluster=max_cluster,
+            n_samples=n_samples,
+            sample_size=sample_size,
+            strata=strata,
+            seed=random_state,
+            n_jobs=n_jobs,
+            backend=backend,
+            **kmeans_kwargs,
         )
+        n_cluster = info["n_cluster"]
 
-        n_cluster = kl.elbow
+    if n_cluster is None:
+        search = elbow_search(
+            X,
+            max_cluster=max_cluster,
+            n_jobs=n_jobs,
+            backend=backend,
+            **kmeans_kwargs,
+        )
+        n_cluster = search["n_cluster"]
+        km = search["models"][n_cluster - 1]
+        sse = search["sse"]
+        info = {key: search[key] for key in ["k", "sse", "fit_time"]}
 
         if plot:
             plt.style.use("fivethirtyeight")
@@ -92,11 +489,256 @@ def KM(
             plt.ylabel("SSE")
             plt.legend()
             plt.show()
+    else:
+        kmeans = BACKENDS[backend](n_clusters=n_cluster, **kmeans_kwargs)
+        km = kmeans.fit(X)
 
-    kmeans = KMeans(n_clusters=n_cluster, **kmeans_kwargs)
+    df[label_var] = km.labels_
 
-    km = kmeans.fit(df2)
+    if model_path is not None:
+        ClusterModel(features, km).save(model_path)
 
-    df[label_var] = km.labels_
+    if return_info:
+        info.update(n_cluster=n_cluster, model=km, features=features)
+        return df, info
 
     return df
+
+
+# K-means incrémental
+class StreamingKM:
+    def __init__(self, n_cluster, vars, batch_size=1024, n_init=3, random_state=40):
+        """
+        Classe qui entraîne un `MiniBatchKMeans` par paquets, sans charger toutes les données.
+
+        Le modèle s'entraîne sur les parties d'un jeu de données
+        (par exemple celui créé par `projet.processing.process_chunked`),
+        puis peut être mis à jour et étiqueter les nouveaux tweets au fil du stream.
+
+        La normalisation est apprise lors du premier passage sur les données (`fit_chunks`),
+        puis gardée fixe pour que les centres restent comparables entre les mises à jour.
+
+        Args:
+            n_cluster (int): Nombre de clusters.
+
+            vars (list): Liste des variables à utiliser.
+
+            batch_size (int, optional): Taille des paquets de `MiniBatchKMeans`.    
+                Par défaut : `1024`.
+
+            n_init (int, optional): Nombre d'initialisations testées sur le premier paquet.    
+                Par défaut : `3`.
+
+            random_state (int, optional): Graine du générateur aléatoire.    
+                Par défaut : `40`.
+
+        Attributes:
+            scaler (sklearn.preprocessing.StandardScaler): Contient la normalisation.
+            model (sklearn.cluster.MiniBatchKMeans): Contient le modèle.
+            n_seen (int): Nombre de lignes vues par le modèle.
+        """
+        self.n_cluster = n_cluster
+        self.vars = list(vars)
+        self.batch_size = batch_size
+        self.scaler = StandardScaler()
+        self.model = MiniBatchKMeans(
+            n_clusters=n_cluster,
+            batch_size=batch_size,
+            n_init=n_init,
+            random_state=random_state,
+        )
+        self.n_seen = 0
+
+    def _features(self, df):
+        """Renvoie les variables de `df` sous forme de tableau, sans les lignes incomplètes."""
+        X = FeatureMatrix(self.vars).to_array(df)
+        return X[~np.isnan(X).any(axis=1)]
+
+    def _partial_fit(self, X):
+        """Entraîne le modèle sur `X` normalisé, par paquets de `batch_size` lignes."""
+        X = self.scaler.transform(X)
+        for i in range(0, len(X), self.batch_size):
+            batch = X[i : i + self.batch_size]
+            # Le premier paquet doit contenir au moins `n_cluster` lignes
+            if self.n_seen == 0 and len(batch) < self.n_cluster:
+                continue
+            self.model.partial_fit(batch)
+            self.n_seen += len(batch)
+
+    def fit_chunks(self, chunks):
+        """
+        Entraîne la normalisation puis le modèle sur des paquets de données.
+
+        Args:
+            chunks (function): Fonction sans argument qui renvoie un itérable de dataframes.    
+                Elle est appelée deux fois : une pour la normalisation, une pour le modèle.    
+                Par exemple `lambda: projet.cache.iter_dataset(store_dir)`.
+
+        Returns:
+            StreamingKM: Le modèle lui-même.
+        """
+        for df in chunks():
+            X = self._features(df)
+            if len(X):
+                self.scaler.partial_fit(X)
+        for df in chunks():
+            self._partial_fit(self._features(df))
+        return self
+
+    def fit_dataset(self, store_dir, fmt="parquet"):
+        """Entraîne le modèle sur les parties d'un jeu de données, voir `fit_chunks`."""
+        return self.fit_chunks(lambda: cache.iter_dataset(store_dir, fmt=fmt))
+
+    def predict(self, df):
+        """
+        Renvoie le cluster de chaque ligne de `df`.
+
+        Returns:
+            pandas.Series: Les clusters, entiers comme ceux de `KM`
+                (type `Int32`, avec `<NA>` pour les lignes incomplètes).
+        """
+        X = FeatureMatrix(self.vars).to_array(df)
+        complete = ~np.isnan(X).any(axis=1)
+        labels = np.zeros(len(df), dtype=np.int32)
+        if complete.any():
+            labels[complete] = self.model.predict(self.scaler.transform(X[complete]))
+        return pd.Series(pd.arrays.IntegerArray(labels, ~complete), index=df.index)
+
+    def to_cluster_model(self):
+        """Renvoie le modèle actuel sous forme de `ClusterModel`, par exemple pour l'enregistrer."""
+        features = FeatureMatrix(self.vars)
+        features.scaler = self.scaler
+        return ClusterModel(features, self.model)
+
+    def update(self, df, label_var="kmlabel"):
+        """
+        Met à jour le modèle avec de nouveaux tweets puis ajoute leurs labels.
+
+        Args:
+            df (pandas.dataframe): Les nouveaux tweets.
+
+            label_var (str, optional): Nom de la colonne des labels.    
+                Par défaut : `"kmlabel"`.
+
+        Returns:
+            pandas.dataframe: Modifie la dataframe d'entrée en ajoutant les labels et la renvoie.
+        """
+        self._partial_fit(self._features(df))
+        df[label_var] = self.predict(df)
+        return df
+
+
+# Modèles enregistrés
+MODEL_VERSION = 1
+"""Version du format des modèles enregistrés"""
+
+
+def feature_signature(vars, dtype=np.float32):
+    """Renvoie la signature (hash sha1) d'une liste de variables et du type de la matrice."""
+    key_json = json.dumps([list(vars), np.dtype(dtype).name])
+    return hashlib.sha1(key_json.encode("utf-8")).hexdigest()
+
+
+class ClusterModel:
+    def __init__(self, features, model):
+        """
+        Classe qui regroupe la normalisation et le modèle de clustering entraînés.
+
+        Permet d'enregistrer le modèle (`save`), de le recharger (`load`)
+        et d'étiqueter de nouveaux tweets (`predict`) sans réentraîner.
+
+        Args:
+            features (FeatureMatrix): Les variables et leur normalisation déjà apprise.
+
+            model: Le modèle entraîné (`KMeans` ou `MiniBatchKMeans`).
+
+        Attributes:
+            features (FeatureMatrix): Contient les variables et la normalisation.
+            model: Contient le modèle.
+            centers (numpy.ndarray): Contient les centres des clusters, du type de la matrice.
+            signature (str): Contient la signature des variables, voir `feature_signature`.
+        """
+        assert features.scaler is not None, "La normalisation n'est pas apprise"
+        self.features = features
+        self.model = model
+        self.centers = np.ascontiguousarray(
+            model.cluster_centers_, dtype=features.dtype
+        )
+        self.signature = feature_signature(features.vars, features.dtype)
+
+    def predict(self, df):
+        """
+        Renvoie le cluster de chaque ligne de `df`.
+
+        Le calcul est vectorisé : distance de chaque ligne à chaque centre,
+        avec `|x - c|² = |x|² - 2 x.c + |c|²` (le terme `|x|²` ne change pas le minimum).
+
+        Returns:
+            pandas.Series: Les clusters, entiers comme ceux de `KM`
+                (type `Int32`, avec `<NA>` pour les lignes incomplètes).
+        """
+        X = self.features.transform(df)
+        complete = ~np.isnan(X).any(axis=1)
+        distances = (self.centers ** 2).sum(axis=1) - 2 * X[complete] @ self.centers.T
+        labels = np.zeros(len(df), dtype=np.int32)
+        labels[complete] = distances.argmin(axis=1)
+        return pd.Series(pd.arrays.IntegerArray(labels, ~complete), index=df.index)
+
+    def label(self, df, label_var="kmlabel"):
+        """Ajoute les clusters de `df` dans la colonne `label_var` et renvoie `df`."""
+        df[label_var] = self.predict(df)
+        return df
+
+    def save(self, path):
+        """
+        Enregistre la normalisation et le modèle, avec la version et la signature des variables.
+
+        Args:
+            path (str): Le chemin du fichier.
+
+        Returns:
+            str: Le chemin du fichier.
+        """
+        artifact = {
+            "version": MODEL_VERSION,
+            "sklearn": sklearn.__version__,
+            "vars": self.features.vars,
+            "dtype": self.features.dtype.name,
+            "signature": self.signature,
+            "scaler": self.features.scaler,
+            "model": self.model,
+            "created": time.time(),
+        }
+        # Écrit dans un fichier temporaire pour ne jamais laisser de modèle à moitié écrit
+        tmp_path = path + ".tmp"
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, vars=None):
+        """
+        Charge un modèle enregistré avec `save`.
+
+        Args:
+            path (str): Le chemin du fichier.
+
+            vars (list, optional): Les variables attendues.    
+                Par défaut : `None` (pas de vérification).
+
+        Returns:
+            ClusterModel: Le modèle.
+        """
+        artifact = joblib.load(path)
+        if artifact.get("version") != MODEL_VERSION:
+            raise utils.ModelVersion(
+                version=artifact.get("version"), expected=MODEL_VERSION
+            )
+        if vars is not None and artifact["signature"] != feature_signature(
+            vars, artifact["dtype"]
+        ):
+            raise utils.FeatureMismatch(vars=artifact["vars"], expected=list(vars))
+
+        features = FeatureMatrix(artifact["vars"], dtype=artifact["dtype"])
+        features.scaler = artifact["scaler"]
+        return cls(features, artifact["model"])
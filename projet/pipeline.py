@@ -0,0 +1,250 @@
+"""Enchaînement déclaratif des étapes de traitement, avec mesures et cache par étape"""
+
+# Import les modules utilisés
+import time
+import tracemalloc
+import pandas as pd
+
+# Import les fonctions de traitement et le cache
+import projet.processing as processing
+import projet.cache as cache
+import projet.listes_variables
+
+
+# Étapes du notebook, après le chargement et le nettoyage
+DEFAULT_STEPS = [
+    (
+        "full_text",
+        processing.get_full_text,
+        {
+            "new_var": "full_text",
+            "text_vars": [
+                "extended_tweet-full_text",
+                "retweeted_status-extended_tweet-full_text",
+                "retweeted_status-text",
+                "text",
+            ],
+            "drop_vars": True,
+        },
+    ),
+    (
+        "politics",
+        processing.add_politics,
+        {
+            "trump_word": "(Trump|Donald|realDonaldTrump|republican)",
+            "biden_word": "(Biden|Joe|JoeBiden|democrat)",
+            "case": False,
+            "trump_var": "contains_trump",
+            "biden_var": "contains_biden",
+            "text_vars": ["full_text", "user-description"],
+        },
+    ),
+    (
+        "sentiment",
+        processing.add_sentiment,
+        {"text_vars": ["full_text", "user-description"], "keep_dict": False},
+    ),
+    ("lang", processing.keep_lang, {"lang_var": "lang", "language": "en"}),
+    ("null", processing.remove_null, {}),
+    ("class", processing.sentiment_class, {"class_var": "class"}),
+    ("label", processing.add_label, {"label_var": "label"}),
+    (
+        "states",
+        processing.get_states,
+        {"state_var": "state", "location_var": "user-location"},
+    ),
+    ("keep_states", processing.keep_states, {"state_var": "state"}),
+]
+"""Étapes du notebook (`full_text`, `politics`, `sentiment`, filtres, `class`, `label`, `states`)"""
+
+
+class Pipeline:
+    def __init__(
+        self,
+        steps=DEFAULT_STEPS,
+        columns=projet.listes_variables.liste_1,
+        cache_dir=None,
+        fmt="parquet",
+        n_jobs=None,
+        trace_memory=False,
+        verbose=False,
+    ):
+        """
+        Classe qui déclare et lance une suite d'étapes de traitement des tweets.
+
+        Les deux premières étapes sont toujours `load` (`tweet_json_to_df`, avec projection des `columns`)
+        et `clean` (`clean_df`), suivies des étapes de `steps`.
+        Chaque étape est chronométrée, et la mémoire de la dataframe obtenue est mesurée.
+
+        Si `cache_dir` est donné, le résultat de chaque étape est enregistré
+        avec une clé qui dépend des fichiers d'entrée (taille et date de modification),
+        de l'étape et de ses paramètres, ainsi que de la clé de l'étape précédente.
+        Un nouveau lancement reprend depuis la dernière étape en cache :
+        si un paramètre change, seules cette étape et les suivantes sont recalculées.
+        Les paramètres sont comparés par leur représentation `json` :
+        les objets doivent avoir une méthode `cache_token` (voir `projet.cache.key_hash`).
+
+        Args:
+            steps (list, optional): Liste de tuples `(nom, fonction, dictionnaire des paramètres)`.    
+                Chaque fonction prend la dataframe en premier argument et la renvoie.    
+                Par défaut : `DEFAULT_STEPS`.
+
+            columns (list, optional): Liste des variables à garder.    
+                Par défaut : `projet.listes_variables.liste_1`.
+
+            cache_dir (str, optional): Dossier du cache.    
+                Par défaut : `None` (pas de cache).
+
+            fmt (str, optional): Format du cache, `"parquet"` ou `"feather"`.    
+                Par défaut : `"parquet"`.
+
+            n_jobs (int, optional): Nombre de processus pour le chargement, voir `tweet_json_to_df`.    
+                Par défaut : `None`.
+
+            trace_memory (bool, optional): Si `True`, mesure aussi le pic de mémoire de chaque étape
+                avec `tracemalloc` (ce qui ralentit le traitement).    
+                Par défaut : `False`.
+
+            verbose (bool, optional): `True` pour afficher les mesures de chaque étape.    
+                Par défaut : `False`.
+
+        Attributes:
+            steps (list): Contient les étapes, sous la forme `(nom, fonction, paramètres)`.
+            report (pandas.dataframe): Mesures du dernier lancement, une ligne par étape :
+                `seconds`, `rows`, `memory` (octets de la dataframe), `peak` (pic de mémoire en octets,
+                si `trace_memory`) et `cached` (`True` si le résultat vient du cache).
+        """
+        names = [step[0] for step in steps]
+        assert len(set(names)) == len(names), "Les noms des étapes doivent être uniques"
+        assert not {"load", "clean"} & set(names), "'load' et 'clean' sont réservés"
+        self.steps = [(name, func, dict(kwargs)) for name, func, kwargs in steps]
+        self.columns = columns
+        self.cache_dir = cache_dir
+        self.fmt = fmt
+        self.n_jobs = n_jobs
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.report = None
+
+    def set_params(self, name, **kwargs):
+        """
+        Change des paramètres d'une étape.
+
+        Args:
+            name (str): Le nom de l'étape.
+
+            **kwargs: Les paramètres à changer.
+
+        Returns:
+            Pipeline: Le pipeline lui-même.
+        """
+        for step_name, func, params in self.steps:
+            if step_name == name:
+                params.update(kwargs)
+                return self
+        raise KeyError(f"L'étape '{name}' n'existe pas")
+
+    def _stages(self):
+        """Renvoie toutes les étapes, chargement et nettoyage compris."""
+        return [
+            (
+                "load",
+                processing.tweet_json_to_df,
+                {
+                    "columns": processing._projection(self.columns),
+                    "n_jobs": self.n_jobs,
+                },
+            ),
+            ("clean", processing.clean_df, {"columns": self.columns}),
+        ] + self.steps
+
+    @staticmethod
+    def _keys(path_list, stages):
+        """Calcule la clé de cache de chaque étape, qui dépend de toutes les précédentes."""
+        key = [cache.file_signature(path) for path in path_list]
+        keys = []
+        for name, func, kwargs in stages:
+            params = {k: v for k, v in kwargs.items() if k != "n_jobs"}
+            key = cache.key_hash([key, name, cache.step_name(func), params])
+            keys.append(key)
+        return keys
+
+    def run(self, path_list=None, folder=None):
+        r"""
+        Lance le pipeline sur les fichiers `.json` donnés.
+
+        Args:
+            path_list (list, optional): Une liste des chemin vers les fichiers `.json`.
+
+            folder (str, optional): Le chemin du dossier qui contient les fichiers `.json`.    
+                À terminer avec un `/` ou `\`.
+
+        Returns:
+            pandas.dataframe: La dataframe après toutes les étapes.
+                Les mesures sont dans `Pipeline.report`.
+        """
+        assert path_list is not None or folder is not None, "Un argument est nécessaire"
+        if path_list is None:
+            path_list = processing.folder_to_path_list(folder_path=folder)
+
+        stages = self._stages()
+        keys = self._keys(path_list, stages) if self.cache_dir else None
+
+        # Cherche l'étape la plus avancée déjà en cache
+        df = None
+        done = 0
+        if self.cache_dir:
+            # Le résultat brut de `load` n'est pas mis en cache, seul celui de `clean` l'est
+            for k in range(len(stages), 1, -1):
+                df = cache.load_cache(self.cache_dir, keys[k - 1], fmt=self.fmt)
+                if df is not None:
+                    done = k
+                    break
+
+        records = [
+            {"step": name, "seconds": 0.0, "rows": None, "cached": True}
+            for name, _, _ in stages[:done]
+        ]
+        if done:
+            records[-1].update(rows=len(df), memory=self._memory(df))
+
+        for k in range(done, len(stages)):
+            name, func, kwargs = stages[k]
+            if self.trace_memory:
+                tracemalloc.start()
+
+            start = time.perf_counter()
+            if k == 0:
+                df = func(path_list=path_list, **kwargs)
+            else:
+                df = func(df, **kwargs)
+            record = {
+                "step": name,
+                "seconds": time.perf_counter() - start,
+                "rows": len(df),
+                "memory": self._memory(df),
+                "cached": False,
+            }
+
+            if self.trace_memory:
+                record["peak"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            records.append(record)
+
+            if self.cache_dir and k > 0:
+                cache.save_cache(df, self.cache_dir, keys[k], fmt=self.fmt)
+
+            if self.verbose:
+                print(
+                    "%-12s %8.2f s %10d lignes %8.1f Mo"
+                    % (name, record["seconds"], record["rows"], record["memory"] / 1e6)
+                )
+
+        self.report = pd.DataFrame(records).set_index("step")
+
+        return df
+
+    @staticmethod
+    def _memory(df):
+        """Renvoie la mémoire (en octets) utilisée par la dataframe."""
+        return int(df.memory_usage(deep=True).sum())
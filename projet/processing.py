@@ -1,11 +1,17 @@
 """Process les tweets récupérés"""
 
 # Import les modules utilisés
+import io
 import json
+import os
+import multiprocessing
+import functools
+import re
+import collections
+import zlib
 import pandas as pd
 import numpy as np
 import glob
-import re
 import us
 from geotext import GeoText
 from geopy.geocoders import Nominatim
@@ -19,6 +25,10 @@ import projet.listes_variables
 # Import les utils du projet
 import projet.projet_utils as utils
 
+# Import le cache sur disque et le géocodage
+import projet.cache as cache
+import projet.geocoding as geocoding
+
 # Download librairie nltk
 nltk.download("vader_lexicon", quiet=True)
 
@@ -28,6 +38,8 @@ def folder_to_path_list(folder_path):
     r"""
     Retourne la liste des fichiers `.json` dans le dossier donné.
 
+    Les fichiers compressés par `SListener` (`.json.gz` et `.json.zst`) sont aussi renvoyés.
+
     Args:
         folder_path (str): Chemin du dossier.    
             À terminer avec un `/` ou `\`.
@@ -39,12 +51,131 @@ def folder_to_path_list(folder_path):
     Returns:
         list: Liste des fichiers `.json` dans le dossier.
     """
-    path_list = glob.glob(folder_path + "*.json")
+    path_list = [
+        path
+        for ext in utils.COMPRESSIONS.values()
+        for path in glob.glob(folder_path + "*.json" + ext)
+    ]
 
     return path_list
 
 
-def tweet_json_to_df(path_list=None, folder=None, verbose=False):
+def compile_columns(columns):
+    """
+    Compile une liste de variables en une fonction d'extraction.
+
+    La fonction renvoyée prend un tweet (dictionnaire) et renvoie un dictionnaire plat
+    qui ne contient que les variables demandées, nommées `"-".join(var)`
+    comme dans `clean_df`.    
+    Les valeurs absentes ou sous un niveau qui n'est pas un dictionnaire valent `np.nan`.
+
+    Args:
+        columns (list): Liste des variables à extraire.    
+            Voir `projet/listes_variables` pour des exemples de listes.
+
+    Returns:
+        function: La fonction d'extraction.
+
+    Examples:
+        extract = compile_columns(projet.listes_variables.liste_1)
+        row = extract(json.loads(line))
+    """
+    specs = [("-".join(var), tuple(var)) for var in columns]
+
+    def _extract(tweet):
+        row = {}
+        for var_name, keys in specs:
+            value = tweet
+            for key in keys:
+                value = value.get(key, np.nan) if isinstance(value, dict) else np.nan
+            row[var_name] = value
+        return row
+
+    return _extract
+
+
+def _projection(columns, index="id", date="created_at"):
+    """Ajoute l'index et la date aux variables à extraire s'ils n'y sont pas."""
+    projection = [list(var) for var in columns]
+    for var in [date, index]:
+        if var and [var] not in projection:
+            projection.insert(0, [var])
+    return projection
+
+
+def _lines_to_df(lines, columns=None):
+    """
+    Décode des lignes de tweets en json et renvoie une dataframe.
+
+    Args:
+        lines (iterable): Les lignes à décoder, les lignes vides sont ignorées.
+
+        columns (list, optional): Liste des variables à extraire pendant le décodage.    
+            Par défaut : `None` (garde tout le tweet).
+
+    Returns:
+        pandas.dataframe: Dataframe pandas qui contient les tweets.
+    """
+    if columns is None:
+        return pd.DataFrame([json.loads(line) for line in lines if line.strip()])
+
+    extract = compile_columns(columns)
+    tweets_list = [extract(json.loads(line)) for line in lines if line.strip()]
+
+    # Garde les colonnes même s'il n'y a aucun tweet
+    return pd.DataFrame(tweets_list, columns=["-".join(var) for var in columns])
+
+
+def _read_lines(path):
+    """
+    Lit une à une les lignes d'un fichier `.json` (compressé ou non).
+
+    Un fichier en cours d'écriture par `SListener` est lu jusqu'à sa dernière ligne complète :
+    la lecture s'arrête sans erreur à la fin tronquée d'un fichier compressé,
+    et une dernière ligne non terminée est ignorée si ce n'est pas un json valide.
+
+    Yields:
+        str: Chaque ligne du fichier.
+    """
+    with utils.open_file(path, "rb") as fh:
+        if path.endswith(utils.COMPRESSIONS["zstd"]):
+            # Le lecteur de `zstandard` ne se parcourt pas ligne par ligne
+            fh = io.BufferedReader(fh)
+        try:
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        # Ligne en cours d'écriture
+                        break
+                yield line.decode("utf-8")
+        except (EOFError, io.UnsupportedOperation):
+            # Fichier compressé en cours d'écriture
+            pass
+
+
+def _json_file_to_df(path, columns=None):
+    """
+    Lit un fichier `.json` (compressé ou non) ligne par ligne et renvoie une dataframe.
+
+    Fonction utilisée par les workers de `tweet_json_to_df` quand `n_jobs` est donné.
+
+    Args:
+        path (str): Chemin vers le fichier `.json`.
+
+        columns (list, optional): Liste des variables à extraire pendant la lecture.    
+            Par défaut : `None` (garde tout le tweet).
+
+    Returns:
+        pandas.dataframe: Dataframe pandas qui contient les tweets du fichier.
+    """
+    return _lines_to_df(_read_lines(path), columns=columns)
+
+
+def tweet_json_to_df(
+    path_list=None, folder=None, verbose=False, n_jobs=None, columns=None
+):
     r"""
     Convertit les fichiers json en dataframe pandas.
 
@@ -57,6 +188,18 @@ def tweet_json_to_df(path_list=None, folder=None, verbose=False):
         verbose (bool, optional): `True` pour afficher une barre de progrès et des messages.    
             Par défaut : `False`.
 
+        n_jobs (int, optional): Nombre de processus entre lesquels répartir les fichiers.    
+            Chaque fichier est lu ligne par ligne par un worker, puis les dataframes sont concaténées.    
+            Mettre `-1` pour utiliser tous les coeurs.    
+            Par défaut : `None` (lecture séquentielle).
+
+        columns (list, optional): Liste des variables à extraire pendant le décodage des tweets.    
+            Seules ces variables (ainsi que `id` et `created_at`) sont gardées,
+            sous le nom `"-".join(var)`, et la dataframe peut être passée directement à `clean_df`
+            avec la même liste.    
+            Voir `projet/listes_variables` pour des exemples de listes.    
+            Par défaut : `None` (garde les tweets en entier).
+
     Returns:
         pandas.dataframe: Dataframe pandas qui contient les tweets.
     """
@@ -69,6 +212,7 @@ def tweet_json_to_df(path_list=None, folder=None, verbose=False):
     assert folder is None or isinstance(
         folder, str
     ), "'folder' doit être une chaîne de caractères"
+    assert n_jobs is None or isinstance(n_jobs, int), "'n_jobs' doit être un entier"
 
     if path_list is None:
         path_list = folder_to_path_list(folder_path=folder)
@@ -78,20 +222,39 @@ def tweet_json_to_df(path_list=None, folder=None, verbose=False):
             "La conversion des fichiers 'json' a commencé, cela peut prendre du temps"
         )
 
+    file_total = len(path_list)
+    n_jobs = utils.get_n_jobs(n_jobs)
+    if columns is not None:
+        columns = _projection(columns)
+
+    # Répartit les fichiers entre plusieurs processus
+    if n_jobs > 1 and file_total > 1:
+        df_list = []
+        with multiprocessing.Pool(processes=min(n_jobs, file_total)) as pool:
+            read_file = functools.partial(_json_file_to_df, columns=columns)
+            for i, df_file in enumerate(pool.imap(read_file, path_list)):
+                df_list.append(df_file)
+                utils.progressBar(i + 1, file_total, prefix="Files", verbose=verbose)
+        if verbose:
+            print("")
+
+        return pd.concat(df_list, ignore_index=True)
+
     # Contient la liste des tweets en json
     tweets_list = []
-    file_total = len(path_list)
+    extract = compile_columns(columns) if columns is not None else None
     for i, path in enumerate(path_list):
-        with open(path, "r") as fh:
-            tweets_json = fh.read().split("\n")
-            for j, tweet in enumerate(tweets_json):
-                tweet_total = len(tweets_json)
-                if tweet:
-                    tweet_obj = json.loads(tweet)
-                    tweets_list.append(tweet_obj)
-                utils.progressBar(
-                    j, tweet_total, file=i + 1, total_file=file_total, verbose=verbose
-                )
+        tweets_json = list(_read_lines(path))
+        tweet_total = len(tweets_json)
+        for j, tweet in enumerate(tweets_json):
+            if tweet.strip():
+                tweet_obj = json.loads(tweet)
+                if extract:
+                    tweet_obj = extract(tweet_obj)
+                tweets_list.append(tweet_obj)
+            utils.progressBar(
+                j, tweet_total, file=i + 1, total_file=file_total, verbose=verbose
+            )
         if verbose:
             print("")
 
@@ -114,6 +277,8 @@ def clean_df(
 
     Il s'agit de selectionner les variables (donc garder que certaines colonnes) qui nous interresse
     (text, , les counts, la localisation, on supprime retweeted_status et quoted_status).
+    Les variables imbriquées d'une même colonne (par exemple `user`) sont extraites
+    ensemble, en un seul passage sur les tweets.
 
     Args:
         df (pandas.dataframe): Une dataframe pandas non filtrée ou nettoyée,
@@ -132,16 +297,19 @@ def clean_df(
             Par défaut : `False`.
 
         columns (list, optional): Liste des variables à garder.    
-            Voir `projet/listes_variables` pour des exemples de listes.
+            Voir `projet/listes_variables` pour des exemples de listes.    
+            Les variables déjà extraites par `tweet_json_to_df(columns=...)`
+            (colonnes `"-".join(var)`) sont reprises telles quelles.
 
     Returns:
         pandas.dataframe: Renvoie une dataframe filtrée et nettoyée.
     """
     # Vérifie que toute les variables données existent dans df
+    df_columns = list(df)
     wrong_var = [
         list(var)[0]
-        for var in [[index], [date]] + columns
-        if var and list(var)[0] not in list(df)
+        for var in [[var] for var in [index, date] if var] + columns
+        if list(var)[0] not in df_columns and "-".join(map(str, var)) not in df_columns
     ]
     if wrong_var:
         raise utils.WrongColumnName(var=wrong_var)
@@ -160,19 +328,27 @@ def clean_df(
     utils.progressBar(current=1, total=total, verbose=verbose)
 
     # Ajoute les variables
+    nested = {}
     for i, var in enumerate(columns):
         var_name = "-".join(var)
-        new_col = df[list(var)[0]]
-        for i in range(1, len(var)):
-            new_col = [
-                new_col[j].get(var[i], np.nan)
-                if isinstance(new_col[j], dict)
-                else np.nan
-                for j in range(len(new_col))
-            ]
-        clean_df[var_name] = new_col
+        if var_name in df_columns:
+            # Variable déjà extraite lors de la lecture
+            clean_df[var_name] = df[var_name]
+        elif len(var) == 1:
+            clean_df[var_name] = df[var[0]]
+        else:
+            # Les variables imbriquées sont extraites ensemble, voir `_extract_nested`
+            nested.setdefault(var[0], []).append(var)
         utils.progressBar(current=i + 2, total=total, verbose=verbose)
 
+    if nested:
+        for top, variables in nested.items():
+            for var, values in zip(variables, _extract_nested(df[top], variables)):
+                clean_df["-".join(var)] = values
+        # Remet les variables dans l'ordre de `columns`
+        order = ([date] if date else []) + ["-".join(var) for var in columns]
+        clean_df = clean_df[list(dict.fromkeys(order))]
+
     # Convertit la date de création des accounts
     if "user-created_at" in clean_df:
         clean_df["user-created_at"] = pd.to_datetime(clean_df["user-created_at"])
@@ -189,6 +365,37 @@ def clean_df(
     return clean_df
 
 
+def _extract_nested(col, variables):
+    """
+    Extrait plusieurs variables imbriquées d'une même colonne en un seul passage.
+
+    Args:
+        col (pandas.Series): La colonne de premier niveau (par exemple `user`).
+
+        variables (list): Les variables à extraire, qui commencent toutes par le nom de `col`.
+
+    Returns:
+        list: Une liste de valeurs par variable, `np.nan` si la valeur est absente.
+    """
+    paths = [tuple(var[1:]) for var in variables]
+    results = [[] for _ in paths]
+    appends = [result.append for result in results]
+    nan = np.nan
+
+    for value in col.tolist():
+        if not isinstance(value, dict):
+            for append in appends:
+                append(nan)
+            continue
+        for append, keys in zip(appends, paths):
+            item = value
+            for key in keys:
+                item = item.get(key, nan) if isinstance(item, dict) else nan
+            append(item)
+
+    return results
+
+
 # Fonctions pour ajouter des colonnes
 def get_full_text(
     df,
@@ -233,6 +440,155 @@ def get_full_text(
     return df
 
 
+def _literal_words(pattern):
+    """Renvoie les mots d'une expression de la forme `"(mot|mot|...)"`, ou `None` si ce n'en est pas une."""
+    if pattern.startswith("(") and pattern.endswith(")"):
+        pattern = pattern[1:-1]
+    words = pattern.split("|")
+    if all(word and re.escape(word) == word for word in words):
+        return words
+    return None
+
+
+class WordTrie:
+    def __init__(self, words):
+        """
+        Arbre (trie) d'une liste de mots, qui trouve en un seul passage sur un texte
+        toutes leurs occurrences, y compris celles qui se chevauchent.
+
+        Les positions où commence au moins un mot sont trouvées par une seule expression régulière
+        (`(?=mot|mot|...)`, qui ne consomme pas le texte), puis l'arbre donne
+        tous les mots qui commencent à chacune de ces positions.
+
+        Args:
+            words (list): La liste des mots (non vides).
+
+        Attributes:
+            trie (dict): Contient l'arbre des mots, la clé `None` donne les indices des mots qui s'y terminent.
+            lengths (list): Contient la longueur de chaque mot.
+            starts (re.Pattern): Contient l'expression qui trouve le début des occurrences.
+        """
+        self.lengths = [len(word) for word in words]
+        self.trie = {}
+        for k, word in enumerate(words):
+            node = self.trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(k)
+
+        # Les mots les plus longs d'abord : l'expression ne sert qu'à trouver les positions
+        alternatives = sorted(set(words), key=len, reverse=True)
+        self.starts = re.compile(
+            "(?=%s)" % "|".join(re.escape(word) for word in alternatives)
+        )
+
+    def find(self, text):
+        """
+        Renvoie les occurrences des mots dans `text`.
+
+        Yields:
+            tuple: (Position du début de l'occurrence, Indice du mot).
+        """
+        n = len(text)
+        for match in self.starts.finditer(text):
+            start = match.start()
+            node = self.trie
+            for i in range(start, n):
+                node = node.get(text[i])
+                if node is None:
+                    break
+                for k in node.get(None, ()):
+                    yield start, k
+
+
+class KeywordMatcher:
+    def __init__(self, groups, case=False):
+        """
+        Classe qui cherche plusieurs groupes de mots-clés dans des textes.
+
+        Les groupes qui sont des listes de mots (par exemple `"(Trump|Donald)"`)
+        sont tous cherchés en un seul passage sur chaque texte, avec un `WordTrie`.
+        Les occurrences de chaque groupe sont ensuite comptées comme le ferait son expression régulière
+        (de gauche à droite, sans chevauchement, le premier mot du groupe étant préféré) :
+        les résultats sont les mêmes que `str.contains`, même si des mots de groupes différents
+        se chevauchent (par exemple `"Trump"` et `"Trump2020"`).    
+        Les autres groupes (expressions régulières quelconques) sont cherchés séparément.
+
+        Args:
+            groups (dict): Dictionnaire qui associe à chaque nom de groupe son expression régulière.    
+                Par exemple : `{"contains_trump": "(Trump|Donald)", "contains_biden": "(Biden|Joe)"}`.
+
+            case (bool, optional): `True` pour être case sensitive.    
+                Par défaut : `False`.
+
+        Attributes:
+            names (list): Contient les noms des groupes.
+            case (bool): Contient la valeur du booléen `case`.
+            trie (WordTrie): Contient l'arbre des mots des groupes de mots, ou `None` s'il n'y en a pas.
+            words (list): Contient, pour chaque mot de l'arbre, le tuple `(groupe, rang dans le groupe)`.
+            regexes (dict): Contient l'expression compilée des autres groupes, par indice de groupe.
+        """
+        self.case = case
+        self.names = list(groups)
+        self.words = []
+        self.regexes = {}
+        words = []
+        for j, reg in enumerate(groups.values()):
+            group_words = _literal_words(reg)
+            if group_words is None:
+                self.regexes[j] = re.compile(reg, 0 if case else re.IGNORECASE)
+                continue
+            for rank, word in enumerate(group_words):
+                words.append(word if case else word.lower())
+                self.words.append((j, rank))
+        self.trie = WordTrie(words) if words else None
+
+    def counts(self, text):
+        """Renvoie le nombre d'occurrences de chaque groupe dans `text` (dans l'ordre de `names`)."""
+        counts = [0] * len(self.names)
+
+        if self.trie is not None:
+            lengths = self.trie.lengths
+            found = sorted(
+                (self.words[k][0], start, self.words[k][1], lengths[k])
+                for start, k in self.trie.find(text if self.case else text.lower())
+            )
+            # Garde, pour chaque groupe, les occurrences que trouverait son expression régulière
+            group, end = None, 0
+            for j, start, _, length in found:
+                if j != group:
+                    group, end = j, 0
+                if start >= end:
+                    counts[j] += 1
+                    end = start + length
+
+        for j, regex in self.regexes.items():
+            counts[j] = sum(1 for _ in regex.finditer(text))
+        return counts
+
+    def count_series(self, texts):
+        """
+        Compte les occurrences de chaque groupe dans une série de textes.
+
+        Chaque texte unique n'est parcouru qu'une fois.
+
+        Args:
+            texts (pandas.Series): La série des textes.
+
+        Returns:
+            numpy.array: Tableau `(nombre de textes, nombre de groupes)` des occurrences,
+                qui vaut `np.nan` pour les valeurs qui ne sont pas du texte.
+        """
+        codes, uniques = pd.factorize(texts)
+        counts = np.full((len(uniques) + 1, len(self.names)), np.nan)
+        for i, text in enumerate(uniques):
+            if isinstance(text, str):
+                counts[i] = self.counts(text)
+
+        # Le code -1 (valeurs manquantes) correspond à la dernière ligne
+        return counts[codes]
+
+
 def add_politics(
     df,
     trump_word="(Trump|Donald|realDonaldTrump|republican)",
@@ -241,6 +597,9 @@ def add_politics(
     trump_var="contains_trump",
     biden_var="contains_biden",
     text_vars=["full_text", "user-description"],
+    groups=None,
+    count=False,
+    count_var="count",
 ):
     """
     Fonction pour ajouter une colonne pour Trump et une pour Biden selon leur présence ou non,
@@ -268,23 +627,167 @@ def add_politics(
         text_vars (list, optional): Liste des variables de textes à regarder.  
             Par défaut : `["full_text", "user-description"]`.
 
+        groups (dict, optional): Dictionnaire `{suffixe de la variable: expression régulière}`
+            pour chercher d'autres candidats ou sujets.    
+            Les groupes de mots sont cherchés en un seul passage sur chaque texte (voir `KeywordMatcher`).    
+            Par défaut : `None` (`{trump_var: trump_word, biden_var: biden_word}`).
+
+        count (bool, optional): Si `True`, ajoute aussi le nombre d'occurrences de chaque groupe.    
+            Par défaut : `False`.
+
+        count_var (str, optional): Le nom du suffixe des variables qui contiennent les nombres d'occurrences.    
+            Par défaut : `"count"`.
+
     Returns:
         pandas.dataframe: Modifie la dataframe d'entrée en ajoutant les colonnes de présence ou non
             de Trump et Biden et la renvoie.
     """
+    if groups is None:
+        groups = {trump_var: trump_word, biden_var: biden_word}
+    matcher = KeywordMatcher(groups, case=case)
+
     for var in text_vars:
-        df[var + "-" + trump_var] = df[var].str.contains(trump_word, case=case)
-        df[var + "-" + biden_var] = df[var].str.contains(biden_word, case=case)
+        counts = matcher.count_series(df[var])
+        missing = np.isnan(counts[:, 0]) if len(counts) else np.zeros(0, dtype=bool)
+        for j, name in enumerate(matcher.names):
+            flags = counts[:, j] > 0
+            if missing.any():
+                # Garde `np.nan` pour les valeurs manquantes, comme `str.contains`
+                flags = flags.astype(object)
+                flags[missing] = np.nan
+            df[var + "-" + name] = flags
+            if count:
+                df[var + "-" + name + "-" + count_var] = counts[:, j]
 
     return df
 
 
+class SentimentCache:
+    def __init__(self, maxsize=1000000, path=None):
+        """
+        Cache borné (LRU) des scores de sentiment, qui peut être enregistré entre deux sessions.
+
+        Args:
+            maxsize (int, optional): Nombre maximal de textes gardés en mémoire.    
+                Les textes les moins récemment utilisés sont oubliés en premier.    
+                Par défaut : `1000000`.
+
+            path (str, optional): Chemin du fichier `.json` où enregistrer le cache.    
+                S'il existe, le cache est chargé à partir de ce fichier.    
+                Par défaut : `None`.
+
+        Attributes:
+            maxsize (int): Contient le nombre maximal de textes.
+            path (str): Contient le chemin du fichier.
+            scores (collections.OrderedDict): Contient les scores de chaque texte.
+        """
+        assert maxsize > 0, "'maxsize' doit être positif"
+        self.maxsize = int(maxsize)
+        self.path = path
+        self.scores = collections.OrderedDict()
+        if path and os.path.isfile(path):
+            with open(path, "r") as fh:
+                self.update(json.load(fh))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def cache_token(self):
+        """Renvoie la clé de cache : le cache ne change pas les scores obtenus."""
+        return None
+
+    def get(self, text):
+        """Renvoie le score de `text`, ou `None` s'il n'est pas dans le cache."""
+        score = self.scores.get(text)
+        if score is not None:
+            self.scores.move_to_end(text)
+        return score
+
+    def update(self, scores):
+        """Ajoute les scores du dictionnaire `scores` et oublie les plus anciens si besoin."""
+        for text, score in scores.items():
+            self.scores[text] = score
+            self.scores.move_to_end(text)
+        while len(self.scores) > self.maxsize:
+            self.scores.popitem(last=False)
+
+    def save(self, path=None):
+        """Enregistre le cache dans `path` (par défaut, le chemin donné à la création)."""
+        path = path or self.path
+        assert path, "Donner le chemin du fichier"
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(self.scores, fh)
+        os.replace(tmp_path, path)
+
+
+# Analyseur utilisé par chaque processus
+_sid = None
+
+
+def _polarity_scores(texts):
+    """Renvoie la liste des scores de sentiment de `texts` (utilisée par les workers)."""
+    global _sid
+    if _sid is None:
+        _sid = SentimentIntensityAnalyzer()
+    return [_sid.polarity_scores(text) for text in texts]
+
+
+def score_texts(texts, cache=None, n_jobs=None, batch_size=1000):
+    """
+    Calcule les scores de sentiment d'une liste de textes (à l'aide de nltk).
+
+    Les doublons ne sont calculés qu'une fois, les textes déjà dans `cache` ne sont pas recalculés
+    et les autres peuvent être répartis entre plusieurs processus.
+
+    Args:
+        texts (list): Liste des textes.
+
+        cache (SentimentCache, optional): Cache des scores déjà calculés, complété par les nouveaux.    
+            Par défaut : `None`.
+
+        n_jobs (int, optional): Nombre de processus entre lesquels répartir les textes.    
+            Mettre `-1` pour utiliser tous les coeurs.    
+            Par défaut : `None` (calcul séquentiel).
+
+        batch_size (int, optional): Nombre de textes envoyés à la fois à chaque processus.    
+            Par défaut : `1000`.
+
+    Returns:
+        dict: Dictionnaire qui associe à chaque texte unique son score.
+    """
+    scores = {}
+    for text in texts:
+        if text not in scores:
+            scores[text] = cache.get(text) if cache is not None else None
+    missing = [text for text, score in scores.items() if score is None]
+
+    n_jobs = utils.get_n_jobs(n_jobs)
+    batches = [missing[i : i + batch_size] for i in range(0, len(missing), batch_size)]
+    if n_jobs > 1 and len(batches) > 1:
+        with multiprocessing.Pool(processes=min(n_jobs, len(batches))) as pool:
+            new_scores = [
+                s for batch in pool.imap(_polarity_scores, batches) for s in batch
+            ]
+    else:
+        new_scores = _polarity_scores(missing)
+
+    new_scores = dict(zip(missing, new_scores))
+    scores.update(new_scores)
+    if cache is not None:
+        cache.update(new_scores)
+
+    return scores
+
+
 def add_sentiment(
     df,
     text_vars=["full_text", "user-description"],
     sent_var="sentiment",
     compound_var="compound",
     keep_dict=False,
+    cache=None,
+    n_jobs=None,
 ):
     """
     Fonction pour ajouter la ou les colonnes de sentiment analysis (à l'aide de nltk).
@@ -306,19 +809,28 @@ def add_sentiment(
             sinon, on garde seulement le compound.    
             Par défaut : `False`.
 
+        cache (SentimentCache, optional): Cache des scores, par exemple partagé entre plusieurs appels
+            ou enregistré sur disque.    
+            Par défaut : `None`.
+
+        n_jobs (int, optional): Nombre de processus pour calculer les scores des textes uniques.    
+            Mettre `-1` pour utiliser tous les coeurs.    
+            Par défaut : `None`.
+
     Returns:
         pandas.dataframe: Modifie la dataframe d'entrée en ajoutant les colonnes de sentiment analysis et la renvoie.
     """
-    sid = SentimentIntensityAnalyzer()
-
-    # Generate sentiment scores
+    # Generate sentiment scores (une seule fois par texte unique)
     for var in text_vars:
-        new_col = df[var].fillna(value="").apply(sid.polarity_scores)
+        codes, uniques = pd.factorize(df[var].fillna(value=""))
+        scores = score_texts(uniques, cache=cache, n_jobs=n_jobs)
+        unique_scores = [scores[text] for text in uniques]
         if keep_dict:
-            df[var + "-" + sent_var] = new_col
-        df[var + "-" + sent_var + "-" + compound_var] = new_col.apply(
-            lambda s: s.get("compound")
-        )
+            unique_dicts = np.empty(len(unique_scores), dtype=object)
+            unique_dicts[:] = unique_scores
+            df[var + "-" + sent_var] = unique_dicts[codes]
+        compounds = np.array([score.get("compound") for score in unique_scores])
+        df[var + "-" + sent_var + "-" + compound_var] = compounds[codes]
 
     return df
 
@@ -408,12 +920,108 @@ def add_label(
 
     choices = [trump_var[1] + biden_var[1], trump_var[1], biden_var[1], missing_var]
 
-    df[label_var] = np.select(conditions, choices) + df[class_var]
+    df[label_var] = np.select(conditions, choices) + df[class_var].astype(str)
 
     return df
 
 
-def get_states(df, state_var="state", location_var="user-location"):
+class StateResolver:
+    def __init__(self, seed=0):
+        """
+        Classe qui associe un état américain à un texte de location.
+
+        Les noms, abréviations et metaphones des états (de `us.STATES`) sont compilés une seule fois
+        dans un arbre (trie), qui trouve en un passage sur le texte tous les états présents.    
+        Le résultat de chaque texte est gardé en cache, car les locations se répètent beaucoup.
+
+        Quand plusieurs états sont trouvés, le choix est déterministe :
+        il dépend seulement du texte et de `seed`.
+
+        Args:
+            seed (int, optional): Graine pour départager les textes où plusieurs états sont trouvés.    
+                Par défaut : `0`.
+
+        Attributes:
+            seed (int): Contient la graine.
+            names (list): Contient les noms des états.
+            trie (dict): Contient l'arbre des motifs.
+            cache (dict): Contient l'état associé à chaque texte déjà vu.
+        """
+        self.seed = seed
+        states = us.STATES
+        self.names = [state.name for state in states]
+        patterns = [
+            (pattern, i)
+            for i, state in enumerate(states)
+            for pattern in [state.name, state.abbr, state.name_metaphone]
+        ]
+
+        # Construit l'arbre des motifs, la clé `None` marque la fin d'un motif
+        self.trie = {}
+        for pattern, i in patterns:
+            node = self.trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(i)
+
+        self.cache = {}
+
+    def cache_token(self):
+        """Renvoie la clé de cache : les états trouvés ne dépendent que de `seed`."""
+        return {"seed": self.seed}
+
+    def matches(self, location):
+        """Renvoie la liste des états présents dans `location` (dans l'ordre de `us.STATES`)."""
+        found = set()
+        n = len(location)
+        for start in range(n):
+            node = self.trie
+            for j in range(start, n):
+                node = node.get(location[j])
+                if node is None:
+                    break
+                if None in node:
+                    found |= node[None]
+
+        return [self.names[i] for i in sorted(found)]
+
+    def resolve(self, location):
+        """Renvoie l'état associé à `location`, ou `np.nan` si aucun état n'est trouvé."""
+        if not isinstance(location, str) or not location:
+            return np.nan
+        if location not in self.cache:
+            match = self.matches(location)
+            if match:
+                # Choix déterministe parmi les états trouvés
+                h = zlib.crc32(f"{self.seed}:{location}".encode("utf-8"))
+                self.cache[location] = match[h % len(match)]
+            else:
+                self.cache[location] = np.nan
+        return self.cache[location]
+
+    def resolve_series(self, locations):
+        """
+        Renvoie les états associés à une série de locations.
+
+        Chaque location unique n'est traitée qu'une fois.
+
+        Args:
+            locations (pandas.Series): La série des textes de location.
+
+        Returns:
+            numpy.array: Le tableau des états (`np.nan` si aucun état n'est trouvé).
+        """
+        codes, uniques = pd.factorize(locations)
+        states = np.empty(len(uniques) + 1, dtype=object)
+        states[:-1] = [self.resolve(location) for location in uniques]
+        states[-1] = np.nan  # Code -1 des valeurs manquantes
+
+        return states[codes]
+
+
+def get_states(
+    df, state_var="state", location_var="user-location", seed=0, resolver=None
+):
     """
     Fonction pour ajouter une colonne contenant l'état de l'user à partir de 'user-location".
 
@@ -426,39 +1034,42 @@ def get_states(df, state_var="state", location_var="user-location"):
         location_var (str, optional): Le nom de la variable de texte où regarder.    
             Par défaut : `"user-location"`.
 
+        seed (int, optional): Graine pour départager les locations où plusieurs états sont trouvés.    
+            Les résultats sont reproductibles pour une même graine.    
+            Par défaut : `0`.
+
+        resolver (StateResolver, optional): Instance de `StateResolver` à utiliser,
+            par exemple pour garder son cache entre plusieurs appels.    
+            Par défaut : `None` (une nouvelle instance avec `seed`).
+
     Returns:
         pandas.dataframe: Modifie la dataframe d'entrée en ajoutant une colonne pour l'état.
     """
-    states = us.STATES
-    full_names = [state.name for state in states]
-    abbreviation = [state.abbr for state in states]
-    state_metaphone = [state.name_metaphone for state in states]
-    # capitals = [state.capital for state in states]
-    full_list = [full_names, abbreviation, state_metaphone]
-    n = len(full_names)
-    assert all(len(var) == n for var in full_list)
-    regs = ["(" + "|".join(var[i] for var in full_list) + ")" for i in range(n)]
-
-    def _reg2(row):
-        if row[location_var]:
-            comps = [re.compile(reg) for reg in regs]
-            l = [bool(comp.search(row[location_var])) for comp in comps]
-            match = np.array(full_names)[l]  # Garde les noms où c'est True
-            if len(match) > 0:
-                return np.random.choice(match)  # Renvoie un des matchs aléatoirement
-        return np.nan
-
-    df[state_var] = df.apply(_reg2, axis=1)
+    if resolver is None:
+        resolver = StateResolver(seed=seed)
+
+    df[state_var] = resolver.resolve_series(df[location_var])
 
     return df
 
 
 def get_states1(
-    df, location_var="user-location", state_var="state2", coord_var="coord"
+    df,
+    location_var="user-location",
+    state_var="state2",
+    coord_var="coord",
+    gazetteer=None,
+    geocode_cache=None,
+    geocoder=None,
 ):
     """
     Fonction pour ajouter une colonne contenant l'état de l'user à partir de 'user-location".
 
+    Les villes trouvées par `GeoText` sont géocodées soit hors ligne avec un gazetteer local,
+    soit en ligne avec Nominatim (avec un cache persistant optionnel),
+    éventuellement de façon concurrente avec `projet.geocoding.AsyncGeocoder`.    
+    Chaque location unique n'est traitée qu'une fois.
+
     Args:
         df (pandas.dataframe): Une dataframe avec une colonne de texte de location.
 
@@ -468,44 +1079,558 @@ def get_states1(
         state_var (str, optional): Nom à donner à la nouvelle variable.    
             Par défaut : `"state"`.
 
+        gazetteer (str or projet.geocoding.Gazetteer, optional): Gazetteer local (ou chemin de sa base)
+            à utiliser à la place de Nominatim, voir `projet.geocoding.build_gazetteer`.    
+            Par défaut : `None` (géocodage en ligne).
+
+        geocode_cache (str or projet.geocoding.GeocodeCache, optional): Cache persistant (ou chemin de sa base)
+            des réponses de Nominatim.    
+            Par défaut : `None`.
+
+        geocoder (projet.geocoding.AsyncGeocoder, optional): Géocodeur concurrent,
+            avec limite de débit et reprises, pour faire toutes les requêtes en ligne à la fois.    
+            S'il est donné, `geocode_cache` est ignoré (utiliser celui du géocodeur).    
+            Par défaut : `None` (requêtes une par une).
+
     Returns:
         pandas.dataframe: Modifie la dataframe d'entrée en ajoutant une colonne pour l'état.
     """
+    if isinstance(gazetteer, str):
+        gazetteer = geocoding.Gazetteer(gazetteer)
+    if isinstance(geocode_cache, str):
+        geocode_cache = geocoding.GeocodeCache(geocode_cache)
+
     geolocator = Nominatim(timeout=2, user_agent="projet-python-twitter")
-    expr = re.compile(", .*, (.*), United States")
-
-    def _reg1(row):
-        if row[location_var]:
-            places = GeoText(row[location_var])
-            lat_lon = []
-            for city in places.cities:
-                try:
-                    loc = geolocator.geocode(city, language="en-US")
-                    if loc:
-                        l_state = expr.findall(loc.address)
-                        if l_state:
-                            st = l_state[0]
-                        else:
-                            st = np.nan
-                        lat_lon.append((st, loc.latitude, loc.longitude))
-                except GeocoderTimedOut as e:
-                    print(f"Error: geocode failed on input {city} with message {e}")
-            if lat_lon:
-                return lat_lon[int(np.random.randint(len(lat_lon)))]
+    resolved = {}
+
+    def _geocode(city):
+        if gazetteer is not None:
+            return gazetteer.lookup(city)
+        if city in resolved:
+            return resolved[city]
+        if geocode_cache is not None and city in geocode_cache:
+            return geocode_cache[city]
+        try:
+            loc = geolocator.geocode(city, language="en-US")
+        except GeocoderTimedOut as e:
+            print(f"Error: geocode failed on input {city} with message {e}")
+            return None
+        result = geocoding.location_to_tuple(loc)
+        if geocode_cache is not None:
+            geocode_cache[city] = result
+        return result
+
+    def _reg1(places):
+        lat_lon = [loc for loc in map(_geocode, places.cities) if loc is not None]
+        if lat_lon:
+            return lat_lon[int(np.random.randint(len(lat_lon)))]
         return np.nan, np.nan, np.nan
 
-    new_col = df.apply(_reg1, axis=1)
+    codes, uniques = pd.factorize(df[location_var])
+    places_list = [GeoText(location) for location in uniques]
+    cities = {city for places in places_list for city in places.cities}
+    if gazetteer is not None:
+        # Une seule recherche dans l'index pour toutes les villes
+        gazetteer.lookup_many(cities)
+    elif geocoder is not None:
+        resolved.update(geocoder.run(cities))
+
+    results = [_reg1(places) for places in places_list] + [(np.nan, np.nan, np.nan)]
+    new_col = [results[code] for code in codes]
     df[state_var] = [row[0] for row in new_col]
     df[coord_var] = [(row[1], row[2]) for row in new_col]
 
     return df
 
 
+# Réduction de la mémoire
+def compact_dtypes(df, categories=None, max_ratio=0.5, counters="count", verbose=False):
+    """
+    Fonction pour réduire la mémoire utilisée par la dataframe en changeant le type des colonnes.
+
+    - Les colonnes de textes qui prennent peu de valeurs différentes
+      (par exemple `lang`, `place-country_code`, les classes de sentiment, `label` ou `state`)
+      deviennent des `category`.
+    - Les colonnes d'entiers sont réduites au plus petit type possible,
+      les compteurs stockés en `float` (à cause des valeurs absentes)
+      deviennent des entiers nullables (`Int32`, ...).
+    - Les indicateurs stockés en `object` deviennent des `bool`
+      (ou des `boolean` nullables s'il manque des valeurs).
+
+    À appliquer en fin de traitement (par exemple après `add_label` et `get_states`).
+
+    Args:
+        df (pandas.dataframe): La dataframe à réduire.
+
+        categories (list, optional): Colonnes de textes à toujours convertir en `category`.    
+            Par défaut : `None`.
+
+        max_ratio (float, optional): Proportion maximale de valeurs différentes
+            pour qu'une colonne de textes devienne une `category`.    
+            Par défaut : `0.5`.
+
+        counters (str, optional): Les colonnes de `float` dont le nom contient `counters`
+            et qui ne contiennent que des entiers sont converties en entiers.    
+            Mettre `None` pour ne garder aucune colonne de `float`.    
+            Par défaut : `"count"`.
+
+        verbose (bool, optional): `True` pour afficher la mémoire économisée.    
+            Par défaut : `False`.
+
+    Returns:
+        pandas.dataframe: Modifie la dataframe d'entrée et la renvoie.    
+            Le nombre d'octets économisés est dans `df.attrs["bytes_saved"]`.
+    """
+    categories = set(categories or [])
+    before = df.memory_usage(deep=True).sum()
+
+    for col in df.columns:
+        series = df[col]
+        kind = series.dtype.kind
+
+        if kind == "O":
+            inferred = pd.api.types.infer_dtype(series, skipna=True)
+            if inferred == "boolean":
+                df[col] = series.astype("boolean" if series.isna().any() else bool)
+            elif inferred == "string" and (
+                col in categories
+                or series.nunique() <= max_ratio * series.notna().sum()
+            ):
+                df[col] = series.astype("category")
+
+        elif kind in "iu":
+            df[col] = pd.to_numeric(series, downcast="integer")
+
+        elif kind == "f" and counters and counters in str(col):
+            values = series.dropna()
+            if (values == np.floor(values)).all():
+                dtype = pd.to_numeric(values.astype(np.int64), downcast="integer").dtype
+                if series.isna().any():
+                    df[col] = series.astype(dtype.name.capitalize())
+                else:
+                    df[col] = series.astype(dtype)
+
+    after = df.memory_usage(deep=True).sum()
+    df.attrs["bytes_saved"] = int(before - after)
+
+    if verbose:
+        print(
+            "Mémoire : %.1f Mo -> %.1f Mo (%.1f Mo économisés)"
+            % (before / 1e6, after / 1e6, (before - after) / 1e6)
+        )
+
+    return df
+
+
+# Traitement fichier par fichier
+def _process_file(
+    path,
+    columns=projet.listes_variables.liste_1,
+    steps=[],
+    cache_dir=None,
+    fmt="parquet",
+):
+    """
+    Charge, nettoie et applique les étapes `steps` à un seul fichier `.json`.
+
+    Si `cache_dir` est donné, reprend depuis l'étape la plus avancée déjà en cache
+    et enregistre le résultat de chaque étape recalculée.
+
+    Voir `process_files` pour les arguments.
+
+    Returns:
+        pandas.dataframe: La dataframe du fichier après toutes les étapes.
+    """
+    stages = [(cache.step_name(clean_df), {"columns": columns})] + [
+        (cache.step_name(func), kwargs) for func, kwargs in steps
+    ]
+
+    # Cherche l'étape la plus avancée déjà en cache
+    df = None
+    done = 0
+    if cache_dir:
+        for k in range(len(stages), 0, -1):
+            key = cache.cache_key(path, stages[:k])
+            df = cache.load_cache(cache_dir, key, fmt=fmt)
+            if df is not None:
+                done = k
+                break
+
+    if done == 0:
+        df = clean_df(
+            _json_file_to_df(path, columns=_projection(columns)), columns=columns
+        )
+        done = 1
+        if cache_dir:
+            cache.save_cache(df, cache_dir, cache.cache_key(path, stages[:1]), fmt=fmt)
+
+    for k in range(done, len(stages)):
+        func, kwargs = steps[k - 1]
+        df = func(df, **kwargs)
+        if cache_dir:
+            key = cache.cache_key(path, stages[: k + 1])
+            cache.save_cache(df, cache_dir, key, fmt=fmt)
+
+    return df
+
+
+def _iter_tail(path, offset=0):
+    """
+    Lit une à une les lignes complètes d'un fichier à partir de la position `offset` (en octets).
+
+    La lecture s'arrête à la première ligne non terminée ou à la fin tronquée
+    d'un fichier compressé (fichier en cours d'écriture par `SListener`).    
+    Pour un fichier compressé, `offset` est une position dans le fichier décompressé :
+    le début du fichier est décompressé sans être gardé en mémoire.
+
+    Yields:
+        tuple: (Ligne, Position de la fin de la ligne).
+    """
+    with utils.open_file(path, "rb") as fh:
+        try:
+            fh.seek(offset)
+            if path.endswith(utils.COMPRESSIONS["zstd"]):
+                # Le lecteur de `zstandard` ne se parcourt pas ligne par ligne
+                fh = io.BufferedReader(fh)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    # Ligne en cours d'écriture
+                    break
+                offset += len(line)
+                yield line.decode("utf-8"), offset
+        except EOFError:
+            # Fichier compressé en cours d'écriture
+            pass
+
+
+def _read_tail(path, offset=0):
+    """
+    Lit les lignes complètes d'un fichier à partir de la position `offset` (en octets).
+
+    Voir `_iter_tail`.
+
+    Returns:
+        tuple: (Liste des lignes lues, Position de la fin de la dernière ligne complète).
+    """
+    lines = []
+    for line, offset in _iter_tail(path, offset):
+        lines.append(line)
+
+    return lines, offset
+
+
+def process_files(
+    path_list=None,
+    folder=None,
+    columns=projet.listes_variables.liste_1,
+    steps=[],
+    cache_dir=None,
+    fmt="parquet",
+    n_jobs=None,
+    verbose=False,
+):
+    r"""
+    Charge, nettoie et traite les fichiers `.json` un par un, avec un cache optionnel sur disque.
+
+    Chaque fichier passe par `tweet_json_to_df` (avec projection des `columns`), `clean_df`,
+    puis par les fonctions de `steps`.    
+    Le résultat de chaque étape est mis en cache au format colonne (Parquet ou Feather),
+    avec une clé qui dépend du chemin, de la taille et de la date de modification du fichier,
+    ainsi que des étapes et de leurs paramètres.    
+    Ainsi, seuls les fichiers nouveaux ou modifiés (ou les étapes dont les paramètres ont changé)
+    sont recalculés.
+
+    Args:
+        path_list (list, optional): Une liste des chemin vers les fichiers `.json`.
+
+        folder (str, optional): Le chemin du dossier qui contient les fichiers `.json`.    
+            À terminer avec un `/` ou `\`.
+
+        columns (list, optional): Liste des variables à garder.    
+            Par défaut : `projet.listes_variables.liste_1`.
+
+        steps (list, optional): Liste de tuples `(fonction, dictionnaire des paramètres)` à appliquer
+            dans l'ordre après `clean_df`.    
+            Par exemple : `[(get_full_text, {}), (add_sentiment, {"text_vars": ["full_text"]})]`.    
+            Par défaut : `[]`.
+
+        cache_dir (str, optional): Dossier du cache.    
+            Par défaut : `None` (pas de cache).
+
+        fmt (str, optional): Format du cache, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+        n_jobs (int, optional): Nombre de processus entre lesquels répartir les fichiers.    
+            Mettre `-1` pour utiliser tous les coeurs.    
+            Par défaut : `None` (traitement séquentiel).
+
+        verbose (bool, optional): `True` pour afficher une barre de progrès.    
+            Par défaut : `False`.
+
+    Returns:
+        pandas.dataframe: La dataframe de tous les fichiers traités.
+
+    Examples:
+        process_files(folder="data/json/", steps=[(get_full_text, {})], cache_dir="data/cache/")
+    """
+    assert path_list is not None or folder is not None, "Un argument est nécessaire"
+    if path_list is None:
+        path_list = folder_to_path_list(folder_path=folder)
+
+    file_total = len(path_list)
+    n_jobs = utils.get_n_jobs(n_jobs)
+    process = functools.partial(
+        _process_file, columns=columns, steps=steps, cache_dir=cache_dir, fmt=fmt
+    )
+
+    df_list = []
+    if n_jobs > 1 and file_total > 1:
+        with multiprocessing.Pool(processes=min(n_jobs, file_total)) as pool:
+            for i, df_file in enumerate(pool.imap(process, path_list)):
+                df_list.append(df_file)
+                utils.progressBar(i + 1, file_total, prefix="Files", verbose=verbose)
+    else:
+        for i, path in enumerate(path_list):
+            df_list.append(process(path))
+            utils.progressBar(i + 1, file_total, prefix="Files", verbose=verbose)
+    if verbose:
+        print("")
+
+    return pd.concat(df_list)
+
+
+# Traitement incrémental
+def update_dataset(
+    store_dir,
+    path_list=None,
+    folder=None,
+    columns=projet.listes_variables.liste_1,
+    steps=[],
+    fmt="parquet",
+    verbose=False,
+):
+    r"""
+    Traite uniquement les nouveaux tweets et les ajoute au jeu de données enregistré dans `store_dir`.
+
+    Un manifeste (`manifest.json`) garde, pour chaque fichier, la position (en octets)
+    jusqu'à laquelle il a déjà été traité.    
+    Pour les fichiers compressés, il garde aussi leur taille et leur date de modification :
+    un fichier compressé qui n'a pas changé n'est pas décompressé.    
+    Seule la fin de chaque fichier (nouveaux fichiers ou lignes ajoutées par `SListener`)
+    est lue, passée dans `clean_df` puis dans `steps`,
+    et le résultat est ajouté au jeu de données sous la forme d'une nouvelle partie.    
+    Le coût d'une mise à jour dépend donc des nouvelles données et non du corpus entier.
+
+    Le jeu de données complet se charge avec `projet.cache.load_dataset(store_dir)`.
+
+    Args:
+        store_dir (str): Dossier qui contient le manifeste et les parties du jeu de données.
+
+        path_list (list, optional): Une liste des chemin vers les fichiers `.json`.
+
+        folder (str, optional): Le chemin du dossier qui contient les fichiers `.json`.    
+            À terminer avec un `/` ou `\`.
+
+        columns (list, optional): Liste des variables à garder.    
+            Par défaut : `projet.listes_variables.liste_1`.
+
+        steps (list, optional): Liste de tuples `(fonction, dictionnaire des paramètres)` à appliquer
+            dans l'ordre après `clean_df`, comme dans `process_files`.    
+            Par défaut : `[]`.
+
+        fmt (str, optional): Format des parties, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+        verbose (bool, optional): `True` pour afficher des messages.    
+            Par défaut : `False`.
+
+    Returns:
+        pandas.dataframe: Les nouveaux tweets traités, ou `None` s'il n'y en a pas.
+
+    Examples:
+        update_dataset("data/dataset/", folder="data/json/", steps=[(get_full_text, {})])
+    """
+    assert path_list is not None or folder is not None, "Un argument est nécessaire"
+    if path_list is None:
+        path_list = folder_to_path_list(folder_path=folder)
+
+    manifest = cache.load_manifest(store_dir)
+    signatures = manifest.setdefault("signatures", {})
+
+    df_list = []
+    for path in path_list:
+        file_key = os.path.abspath(path)
+        offset = manifest["files"].get(file_key, 0)
+        stat = os.stat(path)
+        if utils.is_compressed(path):
+            # Les positions sont dans le fichier décompressé : on compare la taille
+            # et la date de modification du fichier compressé lors de la dernière lecture
+            signature = signatures.get(file_key)
+            if signature == [stat.st_size, stat.st_mtime]:
+                continue
+            if signature is not None and stat.st_size < signature[0]:
+                # Le fichier a été réécrit, on le relit en entier
+                offset = 0
+            signatures[file_key] = [stat.st_size, stat.st_mtime]
+        else:
+            if stat.st_size < offset:
+                # Le fichier a été réécrit, on le relit en entier
+                offset = 0
+            if stat.st_size == offset:
+                continue
+        lines, manifest["files"][file_key] = _read_tail(path, offset)
+        df_list.append(_lines_to_df(lines, columns=_projection(columns)))
+
+    df_new = None
+    if df_list:
+        df_new = clean_df(pd.concat(df_list, ignore_index=True), columns=columns)
+        if len(df_new):
+            for func, kwargs in steps:
+                df_new = func(df_new, **kwargs)
+            cache.save_part(df_new, store_dir, manifest, fmt=fmt)
+        else:
+            df_new = None
+
+    # Le manifeste est écrit après la partie : en cas d'arrêt, rien n'est perdu
+    cache.save_manifest(manifest, store_dir)
+
+    if verbose:
+        n_new = 0 if df_new is None else len(df_new)
+        print(f"{n_new} nouveaux tweets ajoutés à '{store_dir}'")
+
+    return df_new
+
+
+# Traitement par paquets
+def _iter_chunks(path_list, offsets, chunksize):
+    """
+    Lit les lignes complètes des fichiers par paquets de `chunksize` lignes.
+
+    Chaque fichier est lu à partir de sa position dans `offsets` (voir `update_dataset`).
+
+    Yields:
+        tuple: (Liste des lignes du paquet,
+            Dictionnaire de la position atteinte dans chaque fichier lu).
+    """
+    lines = []
+    positions = {}
+    for path in path_list:
+        file_key = os.path.abspath(path)
+        offset = offsets.get(file_key, 0)
+        if not utils.is_compressed(path) and os.path.getsize(path) < offset:
+            # Le fichier a été réécrit, on le relit en entier
+            offset = 0
+
+        for line, end in _iter_tail(path, offset):
+            lines.append(line)
+            positions[file_key] = end
+            if len(lines) >= chunksize:
+                yield lines, positions
+                lines, positions = [], {}
+
+    if lines:
+        yield lines, positions
+
+
+def process_chunked(
+    store_dir,
+    path_list=None,
+    folder=None,
+    chunksize=100000,
+    columns=projet.listes_variables.liste_1,
+    steps=[],
+    fmt="parquet",
+    verbose=False,
+):
+    r"""
+    Traite les fichiers `.json` par paquets de `chunksize` tweets
+    et enregistre chaque paquet comme une partie du jeu de données de `store_dir`.
+
+    Chaque paquet passe par `clean_df` puis par les fonctions de `steps`
+    (par exemple `get_full_text`, `add_politics`, `add_sentiment`, `sentiment_class`,
+    `add_label` et `get_states`), puis est écrit sur le disque avant de lire le suivant :
+    la mémoire utilisée dépend de `chunksize` et non du nombre de fichiers.
+
+    Le manifeste est mis à jour après chaque partie, avec le même format que `update_dataset` :
+    un traitement interrompu reprend là où il s'est arrêté,
+    et `update_dataset` peut ensuite ajouter les nouveaux tweets au même jeu de données.    
+    Les étapes doivent donc traiter chaque tweet indépendamment des autres.
+
+    Le jeu de données complet se charge avec `projet.cache.load_dataset(store_dir)`.
+
+    Args:
+        store_dir (str): Dossier qui contient le manifeste et les parties du jeu de données.
+
+        path_list (list, optional): Une liste des chemin vers les fichiers `.json`.
+
+        folder (str, optional): Le chemin du dossier qui contient les fichiers `.json`.    
+            À terminer avec un `/` ou `\`.
+
+        chunksize (int, optional): Nombre de lignes par paquet.    
+            Par défaut : `100000`.
+
+        columns (list, optional): Liste des variables à garder.    
+            Par défaut : `projet.listes_variables.liste_1`.
+
+        steps (list, optional): Liste de tuples `(fonction, dictionnaire des paramètres)` à appliquer
+            dans l'ordre après `clean_df`, comme dans `process_files`.    
+            Par défaut : `[]`.
+
+        fmt (str, optional): Format des parties, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+        verbose (bool, optional): `True` pour afficher l'avancement.    
+            Par défaut : `False`.
+
+    Returns:
+        int: Le nombre de tweets ajoutés au jeu de données.
+
+    Examples:
+        process_chunked("data/dataset/", folder="data/json/", steps=[(get_full_text, {})])
+    """
+    assert path_list is not None or folder is not None, "Un argument est nécessaire"
+    assert chunksize > 0, "'chunksize' doit être positif"
+    if path_list is None:
+        path_list = folder_to_path_list(folder_path=folder)
+
+    manifest = cache.load_manifest(store_dir)
+
+    n_tweets = 0
+    for lines, positions in _iter_chunks(path_list, manifest["files"], chunksize):
+        df = clean_df(
+            _lines_to_df(lines, columns=_projection(columns)), columns=columns
+        )
+        if len(df):
+            for func, kwargs in steps:
+                df = func(df, **kwargs)
+            cache.save_part(df, store_dir, manifest, fmt=fmt)
+            n_tweets += len(df)
+
+        # Le manifeste est écrit après la partie : en cas d'arrêt, rien n'est perdu
+        manifest["files"].update(positions)
+        cache.save_manifest(manifest, store_dir)
+
+        if verbose:
+            print(
+                f"Partie {len(manifest['parts'])} : {n_tweets} tweets traités", end="\r"
+            )
+
+    if verbose:
+        print("")
+        print(f"{n_tweets} tweets ajoutés à '{store_dir}'")
+
+    return n_tweets
+
+
 # Fonctions pour filtrer la dataframe
-def select_time_range(df, start, end, date_var="created_at"):
+def select_time_range(df, start, end, date_var="created_at", assume_sorted=False):
     """
     Garde les tweets créés entre les dates données. 
 
+    Si la dataframe est triée par date (voir `TimeIndex` ou `load_time_range`),
+    `assume_sorted=True` trouve les bornes par recherche dichotomique
+    au lieu de comparer toutes les dates.
+
     Args:
         df (dataframe): La dataframe pandas qui contient les tweets ainsi qu'une variable datetime.
 
@@ -518,6 +1643,10 @@ def select_time_range(df, start, end, date_var="created_at"):
         date_var (str, optional): Le nom de la colonne qui contient la date.    
             Par défaut : "created_at".
 
+        assume_sorted (bool, optional): `True` si `df` est triée par `date_var`
+            (sans dates manquantes).    
+            Par défaut : `False`.
+
     Returns:
         pandas.dataframe: La dataframe filtrée par le temps.
 
@@ -527,11 +1656,102 @@ def select_time_range(df, start, end, date_var="created_at"):
     start_time = pd.to_datetime(start)
     end_time = pd.to_datetime(end)
 
+    if assume_sorted:
+        dates = df[date_var]
+        first = dates.searchsorted(start_time, side="right")
+        last = dates.searchsorted(end_time, side="left")
+        return df.iloc[first : max(first, last)]
+
     filtered_df = df[(start_time < df[date_var]) & (df[date_var] < end_time)]
 
     return filtered_df
 
 
+class TimeIndex:
+    def __init__(self, df, date_var="created_at"):
+        """
+        Classe qui trie une fois les tweets par date pour sélectionner rapidement des périodes.
+
+        Chaque sélection se fait par recherche dichotomique, en `O(log N)`,
+        et renvoie une vue de la dataframe triée.
+
+        Args:
+            df (pandas.dataframe): La dataframe qui contient les tweets.
+
+            date_var (str, optional): Le nom de la colonne qui contient la date.    
+                Par défaut : `"created_at"`.
+
+        Attributes:
+            df (pandas.dataframe): Contient la dataframe triée par date (sans les dates manquantes).
+            date_var (str): Contient le nom de la colonne de la date.
+        """
+        self.date_var = date_var
+        self.df = df[df[date_var].notna()].sort_values(date_var, kind="mergesort")
+
+    def select(self, start, end):
+        """Garde les tweets créés entre `start` et `end`, voir `select_time_range`."""
+        return select_time_range(
+            self.df, start, end, date_var=self.date_var, assume_sorted=True
+        )
+
+    def windows(self, start, end, freq="H"):
+        """
+        Découpe la période entre `start` et `end` en fenêtres successives de durée `freq`.
+
+        Contrairement à `select`, chaque fenêtre contient sa date de début :
+        tous les tweets de la période sont dans exactement une fenêtre.
+
+        Args:
+            start (str): La date de départ.
+
+            end (str): La date de fin.
+
+            freq (str, optional): La durée des fenêtres, au format de `pandas`.    
+                Par défaut : `"H"`.
+
+        Yields:
+            tuple: (Début de la fenêtre, Dataframe des tweets de la fenêtre).
+        """
+        bounds = pd.date_range(pd.to_datetime(start), pd.to_datetime(end), freq=freq)
+        if len(bounds) == 0 or bounds[-1] < pd.to_datetime(end):
+            bounds = bounds.append(pd.DatetimeIndex([pd.to_datetime(end)]))
+        positions = self.df[self.date_var].searchsorted(bounds, side="left")
+        for i in range(len(bounds) - 1):
+            yield bounds[i], self.df.iloc[positions[i] : positions[i + 1]]
+
+
+def load_time_range(store_dir, start, end, date_var=None, fmt="parquet"):
+    """
+    Charge les tweets créés entre `start` et `end` d'un jeu de données partitionné par date.
+
+    Seules les partitions qui chevauchent la période sont lues (voir `projet.cache.save_by_date`).
+
+    Args:
+        store_dir (str): Le dossier du jeu de données.
+
+        start (str): La date de départ.
+
+        end (str): La date de fin.
+
+        date_var (str, optional): Le nom de la colonne qui contient la date.    
+            Par défaut : `None` (celle utilisée pour partitionner).
+
+        fmt (str, optional): Le format des partitions, `"parquet"` ou `"feather"`.    
+            Par défaut : `"parquet"`.
+
+    Returns:
+        pandas.dataframe: Les tweets de la période, triés par date, ou `None` s'il n'y en a pas.
+    """
+    if date_var is None:
+        date_var = cache.load_partitions(store_dir)["date_var"]
+    names = cache.partitions_in_range(store_dir, start, end)
+    if not names:
+        return None
+
+    df = pd.concat([cache.load_cache(store_dir, name, fmt=fmt) for name in names])
+    return select_time_range(df, start, end, date_var=date_var, assume_sorted=True)
+
+
 def remove_null(df, var="full_text-sentiment-compound"):
     """
     Filtre la dataframe pour garder les tweets où var est non nulle.
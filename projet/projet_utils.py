@@ -1,5 +1,63 @@
 """Fonctions auxiliaires"""
 
+# Import les modules utilisés
+import os
+import gzip
+
+
+# Extensions des fichiers compressés
+COMPRESSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+# Ouverture des fichiers (compressés ou non)
+def open_file(path, mode="r"):
+    """
+    Ouvre un fichier, compressé ou non selon son extension (`.gz` ou `.zst`).
+
+    Le module `zstandard` est nécessaire pour les fichiers `.zst`.
+
+    Args:
+        path (str): Chemin du fichier.
+
+        mode (str, optional): Mode d'ouverture (`"r"`, `"w"`, `"a"`, `"rb"`, ...).    
+            Par défaut : `"r"`.
+
+    Returns:
+        Un objet fichier.
+    """
+    if not is_compressed(path):
+        return open(path, mode)
+
+    # Les modules de compression ouvrent en binaire par défaut
+    binary = "b" in mode
+    mode = mode if binary else mode + "t"
+    encoding = None if binary else "utf-8"
+
+    if path.endswith(COMPRESSIONS["gzip"]):
+        return gzip.open(path, mode, encoding=encoding)
+
+    try:
+        import zstandard
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError(
+            "Le module 'zstandard' est nécessaire pour les fichiers '.zst'"
+        )
+    return zstandard.open(path, mode, encoding=encoding)
+
+
+def is_compressed(path):
+    """Renvoie `True` si le fichier est compressé (d'après son extension)."""
+    return any(path.endswith(ext) for ext in COMPRESSIONS.values() if ext)
+
+
+def get_n_jobs(n_jobs):
+    """Renvoie le nombre de processus à utiliser (`-1` pour tous les coeurs)."""
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+    return max(int(n_jobs), 1)
+
 
 # Affichage du progrès
 def progressBar(
@@ -97,3 +155,30 @@ class WrongColumnName(Exception):
 
     def __str__(self):
         return f"{str(self.var)} {self.msg}"
+
+
+# Erreurs de modelisation.py
+class ModelVersion(Exception):
+    """Erreur à lever si un modèle enregistré n'a pas la version attendue."""
+
+    def __init__(self, version, expected, msg="Version du modèle incompatible :"):
+        self.version = version
+        self.expected = expected
+        self.msg = msg
+        super().__init__(self.msg)
+
+    def __str__(self):
+        return f"{self.msg} {str(self.version)} (attendue : {str(self.expected)})"
+
+
+class FeatureMismatch(Exception):
+    """Erreur à lever si les variables d'un modèle enregistré ne sont pas celles attendues."""
+
+    def __init__(self, vars, expected, msg="Les variables du modèle sont"):
+        self.vars = vars
+        self.expected = expected
+        self.msg = msg
+        super().__init__(self.msg)
+
+    def __str__(self):
+        return f"{self.msg} {str(self.vars)}, pas {str(self.expected)}"
@@ -0,0 +1,357 @@
+"""Rejeu de tweets enregistrés pour tester et mesurer le stream sans connexion à Twitter"""
+
+# Import les modules utilisés
+import os
+import re
+import glob
+import time
+import threading
+import urllib.parse
+import http.server
+import requests
+import tweepy
+
+# Import les erreurs du projet
+import projet.projet_utils as utils
+
+
+# Date d'arrivée d'un message du stream (en millisecondes)
+_TIMESTAMP_EXPR = re.compile(r'"timestamp_ms":\s*"(\d+)"')
+
+
+def iter_messages(path_list=None, folder=None):
+    """
+    Lit les messages (une ligne `json` par message) de fichiers enregistrés par `SListener`.
+
+    Les fichiers compressés (`.json.gz` ou `.json.zst`) sont lus directement.
+
+    Args:
+        path_list (list, optional): Liste des chemins des fichiers.
+
+        folder (str, optional): Dossier dont tous les fichiers `.json` sont lus
+            (utilisé si `path_list` est omis).
+
+    Yields:
+        str: Chaque message, terminé par un retour à la ligne comme ceux reçus du stream.
+    """
+    if path_list is None:
+        assert folder is not None, "Donner 'path_list' ou 'folder'"
+        path_list = sorted(
+            path
+            for ext in utils.COMPRESSIONS.values()
+            for path in glob.glob(os.path.join(folder, "*.json" + ext))
+        )
+
+    for path in path_list:
+        with utils.open_file(path, "r") as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield line + "\r\n"
+
+
+def paced(messages, rate=None, realtime=False, speed=1.0):
+    """
+    Renvoie les messages au rythme demandé.
+
+    Args:
+        messages (iterable): Les messages à rejouer.
+
+        rate (float, optional): Nombre de messages par seconde.    
+            Par défaut : `None` (aussi vite que possible).
+
+        realtime (bool, optional): Si `True`, respecte l'écart entre les dates d'arrivée
+            (`timestamp_ms`) des messages enregistrés, divisé par `speed`.    
+            Par défaut : `False`.
+
+        speed (float, optional): Facteur d'accélération du mode `realtime`.    
+            Par défaut : `1.0`.
+
+    Yields:
+        str: Chaque message, une fois son heure d'envoi atteinte.
+    """
+    assert rate is None or rate > 0, "'rate' doit être positif"
+    assert speed > 0, "'speed' doit être positif"
+
+    start = time.perf_counter()
+    first = None
+    for i, message in enumerate(messages):
+        target = None
+        if realtime:
+            match = _TIMESTAMP_EXPR.search(message)
+            if match:
+                timestamp = int(match.group(1)) / 1000
+                if first is None:
+                    first = timestamp
+                target = start + (timestamp - first) / speed
+        elif rate:
+            target = start + i / rate
+
+        if target is not None:
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield message
+
+
+def _percentile(values, q):
+    """Renvoie le quantile `q` (entre 0 et 1) d'une liste triée."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def replay_stream(
+    listener,
+    path_list=None,
+    folder=None,
+    rate=None,
+    realtime=False,
+    speed=1.0,
+    close=True,
+):
+    """
+    Rejoue des tweets enregistrés dans `listener.on_data`, comme le ferait `tweepy.Stream`.
+
+    Permet de mesurer les performances d'un `SListener` (débit, latence, coût des rotations)
+    sans connexion à Twitter.
+    Le rejeu s'arrête à la fin des fichiers, quand `on_data` renvoie `False`
+    ou quand le listener lève `KeyboardInterrupt` (nombre de tweets ou durée atteint).
+
+    Args:
+        listener: Le listener qui reçoit les messages, en général un `SListener`.
+
+        path_list, folder: Les fichiers à rejouer, voir `iter_messages`.
+
+        rate, realtime, speed: Le rythme du rejeu, voir `paced`.
+
+        close (bool, optional): Si `True`, appelle `listener.close` à la fin
+            et mesure le temps d'écriture des tweets en attente.    
+            Par défaut : `True`.
+
+    Returns:
+        dict: Les mesures du rejeu :
+            `messages` et `tweets` (nombres envoyés et acceptés par le listener),
+            `seconds` (durée totale), `tweets_per_s`,
+            `latency_mean_ms`, `latency_p99_ms` et `latency_max_ms` (durée des appels à `on_data`),
+            `close_s` (durée de `close`), et pour un `SListener` :
+            `written`, `dropped`, `files`, `write_s` et `rotation_s`.
+    """
+    latencies = []
+    nb_start = getattr(listener, "nb_tweets", 0)
+    start = time.perf_counter()
+
+    try:
+        for message in paced(
+            iter_messages(path_list, folder), rate=rate, realtime=realtime, speed=speed
+        ):
+            call_start = time.perf_counter()
+            try:
+                result = listener.on_data(message)
+            finally:
+                latencies.append(time.perf_counter() - call_start)
+            if result is False:
+                break
+    except KeyboardInterrupt:
+        pass
+
+    close_start = time.perf_counter()
+    if close and hasattr(listener, "close"):
+        listener.close()
+    end = time.perf_counter()
+
+    seconds = end - start
+    tweets = getattr(listener, "nb_tweets", len(latencies)) - nb_start
+    latencies.sort()
+    stats = {
+        "messages": len(latencies),
+        "tweets": tweets,
+        "seconds": seconds,
+        "tweets_per_s": tweets / seconds if seconds > 0 else float("inf"),
+        "latency_mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        "latency_p99_ms": 1000 * _percentile(latencies, 0.99),
+        "latency_max_ms": 1000 * latencies[-1] if latencies else 0.0,
+        "close_s": end - close_start,
+    }
+    for key, attr in [
+        ("written", "written"),
+        ("dropped", "dropped"),
+        ("files", "n_files"),
+        ("write_s", "write_time"),
+        ("rotation_s", "rotation_time"),
+    ]:
+        if hasattr(listener, attr):
+            stats[key] = getattr(listener, attr)
+
+    return stats
+
+
+# Serveur local qui remplace l'API de stream
+class _StreamHandler(http.server.BaseHTTPRequestHandler):
+    def _stream(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        server = self.server.replay
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.end_headers()
+
+        try:
+            for message in paced(
+                iter_messages(server.path_list, server.folder),
+                rate=server.rate,
+                realtime=server.realtime,
+                speed=server.speed,
+            ):
+                if server.stopped.is_set():
+                    break
+                # Format `delimited=length` de l'API : la taille puis le message
+                data = message.encode("utf-8")
+                self.wfile.write(b"%d\r\n" % len(data) + data)
+                server.sent += 1
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Le client s'est déconnecté
+            pass
+
+    do_GET = _stream
+    do_POST = _stream
+
+    def log_message(self, format, *args):
+        return
+
+
+class ReplayServer:
+    def __init__(
+        self,
+        path_list=None,
+        folder=None,
+        rate=None,
+        realtime=False,
+        speed=1.0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """
+        Serveur HTTP local qui rejoue des tweets enregistrés comme l'API de stream de Twitter.
+
+        Chaque connexion reçoit tous les messages au format `delimited=length`,
+        puis le serveur ferme la connexion.
+        Utiliser `ReplayServer.stream` pour obtenir un `tweepy.Stream` connecté au serveur :
+        toute la chaîne de lecture de `tweepy` est alors mesurée.
+
+        S'utilise avec `with` pour démarrer et arrêter le serveur.
+
+        Args:
+            path_list, folder: Les fichiers à rejouer, voir `iter_messages`.
+
+            rate, realtime, speed: Le rythme du rejeu, voir `paced`.
+
+            host (str, optional): L'adresse d'écoute.    
+                Par défaut : `"127.0.0.1"`.
+
+            port (int, optional): Le port d'écoute (`0` pour un port libre).    
+                Par défaut : `0`.
+
+        Attributes:
+            url (str): Contient l'adresse du serveur, par exemple `http://127.0.0.1:8080`.
+            sent (int): Compteur du nombre de messages envoyés.
+        """
+        self.path_list = path_list
+        self.folder = folder
+        self.rate = rate
+        self.realtime = realtime
+        self.speed = speed
+        self.sent = 0
+        self.stopped = threading.Event()
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), _StreamHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self.url = "http://%s:%d" % self.httpd.server_address[:2]
+        self._thread = None
+
+    def start(self):
+        """Démarre le serveur dans un thread."""
+        self.stopped.clear()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le serveur."""
+        self.stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stream(self, listener, auth=None, **options):
+        """
+        Renvoie un `tweepy.Stream` dont les requêtes sont envoyées à ce serveur.
+
+        Args:
+            listener: Le listener du stream, en général un `SListener`.
+
+            auth (optional): Objet d'authentification `tweepy`.    
+                Par défaut : `None` (`listener.api.auth`).
+
+            **options (optional): Arguments à passer à `tweepy.Stream`.
+
+        Returns:
+            ReplayStream: Le stream, à lancer avec `filter`.
+        """
+        if auth is None:
+            auth = listener.api.auth
+        return ReplayStream(self.url, auth, listener, **options)
+
+
+class _RedirectAdapter(requests.adapters.HTTPAdapter):
+    """Envoie toutes les requêtes vers `base_url` en gardant le chemin et les paramètres."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        parts = urllib.parse.urlsplit(request.url)
+        request.url = urllib.parse.urlunsplit(
+            urllib.parse.urlsplit(self.base_url)[:2] + parts[2:]
+        )
+        return super().send(request, **kwargs)
+
+
+class ReplayStream(tweepy.Stream):
+    def __init__(self, base_url, auth, listener, **options):
+        """
+        `tweepy.Stream` connecté à un `ReplayServer` au lieu de l'API de Twitter.
+
+        Le stream s'arrête quand le serveur ferme la connexion, au lieu de se reconnecter.
+
+        Args:
+            base_url (str): L'adresse du serveur (`ReplayServer.url`).
+
+            auth: Objet d'authentification `tweepy`.
+
+            listener: Le listener du stream.
+
+            **options (optional): Arguments à passer à `tweepy.Stream`.
+        """
+        self.base_url = base_url
+        super().__init__(auth, listener, **options)
+
+    def new_session(self):
+        super().new_session()
+        self.session.mount("https://", _RedirectAdapter(self.base_url))
+
+    def on_closed(self, resp):
+        # Fin du rejeu
+        self.running = False
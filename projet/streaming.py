@@ -1,9 +1,15 @@
 """Module pour récupèrer les tweets avec l'API Twitter"""
 
 # Import les modules utilisés
+import os
 import time
 import sys
+import re
 import json
+import queue
+import random
+import collections
+import threading
 import tweepy
 
 # Import les erreurs du projet
@@ -92,6 +98,102 @@ class CredentialsClass:
         return auth, api
 
 
+# Classification des messages du stream
+# Types des messages de contrôle, identifiés par leur première clé
+CONTROL_KEYS = frozenset(
+    [
+        "delete",
+        "limit",
+        "warning",
+        "disconnect",
+        "scrub_geo",
+        "status_withheld",
+        "user_withheld",
+        "event",
+        "friends",
+        "direct_message",
+    ]
+)
+_LEADING_KEY_EXPR = re.compile(r'\s*\{\s*"([^"]*)"')
+_LANG_VALUE_EXPR = re.compile(r'\s*"([^"]*)"')
+
+
+def message_type(data):
+    """
+    Renvoie le type d'un message du stream à partir de sa première clé, sans lire tout le `json`.
+
+    Args:
+        data (str): Le message brut.
+
+    Returns:
+        str: La première clé pour un message de contrôle (voir `CONTROL_KEYS`),
+            `"status"` pour un tweet, ou `None` si le message n'est pas un objet `json`.
+    """
+    match = _LEADING_KEY_EXPR.match(data)
+    if match is None:
+        return None
+    key = match.group(1)
+    return key if key in CONTROL_KEYS else "status"
+
+
+def status_lang(data):
+    """
+    Renvoie la langue d'un tweet brut sans lire tout le `json`.
+
+    La clé `lang` du tweet est la dernière du message
+    (après celles des tweets retweetés ou cités).
+
+    Args:
+        data (str): Le tweet brut.
+
+    Returns:
+        str: Le code de la langue, ou `None` s'il est absent.
+    """
+    i = data.rfind('"lang":')
+    if i < 0:
+        return None
+    match = _LANG_VALUE_EXPR.match(data, i + len('"lang":'))
+    return match.group(1) if match else None
+
+
+def is_retweet(data):
+    """Renvoie `True` si le tweet brut est un retweet."""
+    # Un guillemet du texte est échappé, la clé ne peut donc venir que du json
+    return '"retweeted_status":' in data
+
+
+def make_filter(lang=None, retweets=True):
+    """
+    Crée un filtre appliqué aux tweets bruts avant leur écriture.
+
+    Args:
+        lang (str or list, optional): Langue(s) des tweets gardés.    
+            Par défaut : `None` (toutes les langues).
+
+        retweets (bool, optional): Si `False`, les retweets sont ignorés.    
+            Par défaut : `True`.
+
+    Returns:
+        function: Fonction qui renvoie `True` si le tweet doit être gardé,
+            ou `None` s'il n'y a rien à filtrer.
+    """
+    if isinstance(lang, str):
+        lang = [lang]
+    langs = frozenset(lang) if lang else None
+
+    if langs is None and retweets:
+        return None
+
+    def _keep(data):
+        if not retweets and is_retweet(data):
+            return False
+        if langs is not None and status_lang(data) not in langs:
+            return False
+        return True
+
+    return _keep
+
+
 # Stream des Tweets
 class SListener(tweepy.StreamListener):
     def __init__(
@@ -104,15 +206,31 @@ class SListener(tweepy.StreamListener):
         max=20000,
         verbose=False,
         start=None,
+        queue_size=10000,
+        batch_size=100,
+        max_bytes=0,
+        max_time=None,
+        compression=None,
+        status_filter=None,
     ):
         """
         Classe qui crée le stream de Tweets et gère l'enregistrement des Tweets récupérés.
 
         Hérite de la classe `StreamListener` de `tweepy.streaming`.
 
+        Les tweets reçus sont mis dans une file d'attente bornée, vidée par paquets
+        par un thread d'écriture dédié : l'écriture sur le disque et la rotation des fichiers
+        ne bloquent pas la lecture du stream.    
+        Si la file est pleine, le tweet est perdu et compté dans `dropped`.    
+        Appeler `close` pour écrire les tweets en attente et fermer le fichier.
+
         Chaque Tweet est enregistré au format `.json`.    
         Puis les tweets sont rassemblés dans des fichiers `.json` de la forme:    
-        `[fprefix]_YYYYmmdd-HHMMSS.json`.
+        `[fprefix]_YYYYmmdd-HHMMSS.json`.    
+        Un nouveau fichier est créé selon le nombre de tweets (`max`), la taille (`max_bytes`)
+        ou la durée (`max_time`) du fichier actuel.    
+        Les fichiers peuvent être compressés à la volée (`.json.gz` ou `.json.zst`),
+        ils sont lus directement par `projet.processing.tweet_json_to_df`.
 
         Args:
             credentials: 
@@ -156,6 +274,34 @@ class SListener(tweepy.StreamListener):
                 Contient l'heure du début du stream.
 
                 Par défaut : `None`
+            queue_size (int, optional): 
+                Nombre maximal de tweets en attente d'écriture.
+
+                Par défaut : `10000`.
+            batch_size (int, optional): 
+                Nombre maximal de tweets écrits à la fois par le thread d'écriture.
+
+                Par défaut : `100`.
+            max_bytes (int, optional): 
+                Taille maximale (en octets, avant compression) de chaque fichier.
+
+                Mettre 0 (ou un nombre négatif) pour ne pas avoir de limite.
+
+                Par défaut : `0`.
+            max_time (float, optional): 
+                Durée maximale (en heures) d'écriture dans chaque fichier.
+
+                Par défaut : `None` (pas de limite).
+            compression (str, optional): 
+                Compression des fichiers : `"gzip"` ou `"zstd"` (nécessite `zstandard`).
+
+                Par défaut : `None` (pas de compression).
+            status_filter (function, optional): 
+                Fonction appliquée à chaque tweet brut, qui renvoie `False` pour l'ignorer.
+
+                Voir `make_filter`.
+
+                Par défaut : `None` (tous les tweets sont gardés).
 
         Attributes:
             api: 
@@ -170,11 +316,33 @@ class SListener(tweepy.StreamListener):
             timeout (float): Contient la durée du stream.
             fprefix (str): Contient le préfixe.
             path (str): Contient le chemin du dossier.
-            output (str): 
+            output: 
+                Contient le fichier actuel.
+            filename (str): 
                 Contient le chemin du fichier actuel.
 
-                Au format: `[path][fprefix]_YYYYmmdd-HHMMSS.json`.
+                Au format: `[path][fprefix]_YYYYmmdd-HHMMSS.json` (suivi de `.gz` ou `.zst`).
+            max_bytes (int): Contient la taille maximale de chaque fichier.
+            max_time (float): Contient la durée maximale de chaque fichier.
+            compression (str): Contient le type de compression.
+            file_bytes (int): Compteur de la taille du fichier actuel (avant compression).
+            file_start (float): Contient l'heure de création du fichier actuel.
             verbose (bool): Contient la valeur du booléen `verbose`.
+            queue (queue.Queue): Contient la file des tweets en attente d'écriture.
+            batch_size (int): Contient le nombre maximal de tweets écrits à la fois.
+            dropped (int): Compteur du nombre de tweets perdus (file pleine ou erreur d'écriture).
+            written (int): Compteur du nombre de tweets écrits.
+            writer (threading.Thread): Contient le thread d'écriture.
+            write_error (Exception): Contient l'erreur qui a arrêté le thread d'écriture, ou `None`.
+            n_files (int): Compteur du nombre de fichiers créés.
+            write_time (float): Temps total (en secondes) passé à écrire, rotations comprises.
+            rotation_time (float): Temps total (en secondes) passé à changer de fichier.
+            last_error (int): Contient le dernier code d'erreur HTTP reçu, ou `None`.
+            connections (int): Compteur du nombre de connexions au stream.
+            downtime (float): Temps total (en secondes) passé déconnecté entre deux connexions.
+            disconnected_at (float): Contient l'heure de la dernière déconnexion, ou `None`.
+            status_filter (function): Contient le filtre des tweets.
+            filtered (int): Compteur du nombre de tweets ignorés par le filtre.
         """
         if not isinstance(credentials, CredentialsClass):
             raise utils.CredentialsClassType(type=type(credentials))
@@ -192,38 +360,202 @@ class SListener(tweepy.StreamListener):
         if path:
             assert path[-1] in ["/", "\\"], "'path' doit terminer par '/' ou '\\'."
         self.path = path
-        self.output = open(
-            self.path + self.fprefix + "_" + time.strftime("%Y%m%d-%H%M%S") + ".json",
-            "w",
+        self.max_bytes = int(max_bytes) if max_bytes > 0 else 0
+        self.max_time = max_time
+        assert (
+            compression in utils.COMPRESSIONS
+        ), f"'compression' doit être dans {list(utils.COMPRESSIONS)}"
+        self.compression = compression
+        self.status_filter = status_filter
+        self.filtered = 0
+        self.n_files = 0
+        self.rotation_time = 0.0
+        self.write_time = 0.0
+        self.output = self._open_output()
+
+        # Suivi des connexions
+        self.last_error = None
+        self.connections = 0
+        self.downtime = 0.0
+        self.disconnected_at = None
+
+        # File d'attente et thread d'écriture
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = int(batch_size) if batch_size > 0 else 1
+        self.dropped = 0
+        self.written = 0
+        self.write_error = None
+        self._closed = False
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _open_output(self):
+        """Ouvre un nouveau fichier de sortie et remet à zéro ses compteurs."""
+        name = self.path + self.fprefix + "_" + time.strftime("%Y%m%d-%H%M%S")
+        ext = ".json" + utils.COMPRESSIONS[self.compression]
+        self.filename = name + ext
+        # Évite d'écraser un fichier créé dans la même seconde
+        i = 1
+        while os.path.exists(self.filename):
+            self.filename = f"{name}-{i}{ext}"
+            i += 1
+
+        self.counter = 0
+        self.file_bytes = 0
+        self.file_start = time.time()
+        self.n_files += 1
+
+        return utils.open_file(self.filename, "w")
+
+    def _should_rotate(self):
+        """Renvoie `True` si le fichier actuel a atteint une de ses limites."""
+        return bool(
+            (self.max and self.counter >= self.max)
+            or (self.max_bytes and self.file_bytes >= self.max_bytes)
+            or (self.max_time and time.time() - self.file_start >= self.max_time * 3600)
         )
 
+    @property
+    def queue_depth(self):
+        """Nombre de tweets en attente d'écriture."""
+        return self.queue.qsize()
+
+    def _write_loop(self):
+        """Boucle du thread d'écriture : vide la file par paquets jusqu'à `close`."""
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is None
+            statuses = [status for status in batch if status is not None]
+            try:
+                self._write_batch(statuses)
+            except Exception as e:
+                # Arrête l'écriture : l'erreur est relancée par `on_status` et `close`
+                self.write_error = e
+                self.dropped += len(statuses)
+                stop = True
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, statuses):
+        """Écrit un paquet de tweets et change de fichier si besoin."""
+        start = time.perf_counter()
+        for status in statuses:
+            self.output.write(status)
+            self.counter += 1
+            self.written += 1
+            self.file_bytes += len(status.encode("utf-8"))
+
+            if self.verbose and not self.nb and self.counter % 100 == 0:
+                print(["|", "/", "-", "\\"][self.counter // 100 % 4], end="\r")
+
+            if self._should_rotate():
+                rotation_start = time.perf_counter()
+                self.output.close()
+                self.output = self._open_output()
+                self.rotation_time += time.perf_counter() - rotation_start
+        self.output.flush()
+        self.write_time += time.perf_counter() - start
+
+    def close(self, timeout=None):
+        """
+        Écrit les tweets en attente, arrête le thread d'écriture et ferme le fichier.
+
+        Relance l'erreur qui a arrêté le thread d'écriture, s'il y en a eu une,
+        et lève `TimeoutError` si le thread n'a pas fini avant `timeout`.
+
+        Args:
+            timeout (float, optional): Attente maximale (en secondes) du thread d'écriture.    
+                Par défaut : `None` (jusqu'à la fin de l'écriture).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        # Le thread d'écriture a pu s'arrêter sur une erreur : ne pas attendre une file pleine
+        while self.writer.is_alive():
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+        self.writer.join(
+            None if deadline is None else max(deadline - time.perf_counter(), 0)
+        )
+        if self.writer.is_alive():
+            raise TimeoutError("Le thread d'écriture ne s'est pas arrêté à temps")
+
+        # Les tweets restés dans la file ne seront pas écrits
+        while True:
+            try:
+                if self.queue.get_nowait() is not None:
+                    self.dropped += 1
+            except queue.Empty:
+                break
+
+        try:
+            self.output.close()
+        except Exception as e:
+            if self.write_error is None:
+                self.write_error = e
+        if self.write_error is not None:
+            raise self.write_error
+
+    def on_connect(self):
+        self.connections += 1
+        self.last_error = None
+        if self.disconnected_at is not None:
+            self.downtime += time.time() - self.disconnected_at
+            self.disconnected_at = None
+
     def on_data(self, data):
-        if "in_reply_to_status" in data:
+        kind = message_type(data)
+        if kind == "status":
+            if self.status_filter is not None and not self.status_filter(data):
+                self.filtered += 1
+                return
             self.on_status(data)
-        elif "delete" in data:
+        elif kind == "delete":
             delete = json.loads(data)["delete"]["status"]
             if self.on_delete(delete["id"], delete["user_id"]) is False:
                 return False
-        elif "limit" in data:
+        elif kind == "limit":
             if self.on_limit(json.loads(data)["limit"]["track"]) is False:
                 return False
-        elif "warning" in data:
-            warning = json.loads(data)["warnings"]
+        elif kind == "warning":
+            warning = json.loads(data)["warning"]
             print("WARNING: %s" % warning["message"])
             return
+        elif kind == "disconnect":
+            if self.on_disconnect(json.loads(data)["disconnect"]) is False:
+                return False
 
     def on_status(self, status):
-        self.output.write(status)
-        self.counter += 1
+        if self.write_error is not None:
+            # Le thread d'écriture est arrêté : les tweets suivants seraient perdus
+            raise self.write_error
+
+        # Confie le tweet au thread d'écriture sans attendre
+        try:
+            self.queue.put_nowait(status)
+        except queue.Full:
+            self.dropped += 1
+            return
         self.nb_tweets += 1
 
-        if self.verbose:
-            if self.nb:
-                utils.progressBar(
-                    current=self.nb_tweets, total=self.nb, verbose=self.verbose
-                )
-            elif self.counter % 100 == 0:
-                print(["|", "/", "-", "\\"][self.counter // 100 % 4], end="\r")
+        if self.verbose and self.nb:
+            utils.progressBar(
+                current=self.nb_tweets, total=self.nb, verbose=self.verbose
+            )
 
         if self.nb and self.nb_tweets >= self.nb:
             print("")
@@ -234,17 +566,6 @@ class SListener(tweepy.StreamListener):
             print("Durée terminée")
             raise KeyboardInterrupt
 
-        if self.counter >= 20000:
-            self.output.close()
-            self.output = open(
-                self.path
-                + self.fprefix
-                + "_"
-                + time.strftime("%Y%m%d-%H%M%S")
-                + ".json",
-                "w",
-            )
-            self.counter = 0
         return
 
     def on_delete(self, status_id, user_id):
@@ -256,12 +577,118 @@ class SListener(tweepy.StreamListener):
         return
 
     def on_error(self, status_code):
-        print(sys.stderr, "Encountered error with status code:", status_code)
-        return True  # Don't kill the stream
+        print("Encountered error with status code:", status_code, file=sys.stderr)
+        # Arrête la connexion : `start_stream` choisit l'attente avant de se reconnecter
+        self.last_error = status_code
+        return False
 
     def on_timeout(self):
-        print(sys.stderr, "Timeout...")
-        return True  # Don't kill the stream
+        print("Timeout...", file=sys.stderr)
+        # Erreur réseau : arrête aussi la connexion
+        self.last_error = None
+        return False
+
+    def on_disconnect(self, notice):
+        print("Disconnect notice: %s" % notice, file=sys.stderr)
+        self.last_error = None
+        return False
+
+
+class PolicyStream(tweepy.Stream):
+    """
+    `tweepy.Stream` qui ne se reconnecte jamais de lui-même.
+
+    `filter` rend la main dès que la connexion s'arrête (erreur, timeout ou fermeture par Twitter),
+    pour que chaque reconnexion passe par une `ReconnectPolicy` et soit comptée dans les mesures.
+    """
+
+    def on_closed(self, resp):
+        # Connexion fermée par Twitter
+        self.running = False
+
+
+# Codes HTTP de limitation du nombre de requêtes
+RATE_LIMIT_CODES = (420, 429)
+
+
+class ReconnectPolicy:
+    def __init__(
+        self,
+        network=(0.25, 16),
+        http=(5, 320),
+        rate_limit=(60, 960),
+        factor=2.0,
+        jitter=0.5,
+        seed=None,
+    ):
+        """
+        Calcule l'attente avant de se reconnecter au stream (backoff exponentiel avec aléa).
+
+        Les erreurs sont séparées en trois types, chacun avec son attente initiale
+        et son attente maximale (en secondes), comme conseillé par Twitter :    
+        `"network"` (erreur de connexion), `"http"` (code d'erreur HTTP)
+        et `"rate_limit"` (codes 420 et 429).    
+        L'attente est multipliée par `factor` à chaque erreur du même type,
+        puis une part aléatoire (au plus `jitter`) en est retirée
+        pour que plusieurs clients ne se reconnectent pas en même temps.
+
+        Args:
+            network (tuple, optional): Attentes initiale et maximale après une erreur réseau.    
+                Par défaut : `(0.25, 16)`.
+
+            http (tuple, optional): Attentes initiale et maximale après une erreur HTTP.    
+                Par défaut : `(5, 320)`.
+
+            rate_limit (tuple, optional): Attentes initiale et maximale après une limitation.    
+                Par défaut : `(60, 960)`.
+
+            factor (float, optional): Facteur multiplicatif de l'attente.    
+                Par défaut : `2.0`.
+
+            jitter (float, optional): Part maximale de l'attente tirée au hasard, entre 0 et 1.    
+                Par défaut : `0.5`.
+
+            seed (int, optional): Graine du générateur aléatoire.    
+                Par défaut : `None`.
+
+        Attributes:
+            attempts (dict): Nombre d'erreurs consécutives de chaque type.
+            errors (collections.Counter): Nombre total d'erreurs de chaque type.
+            waited (float): Temps total d'attente demandé (en secondes).
+        """
+        assert factor >= 1, "'factor' doit être supérieur à 1"
+        assert 0 <= jitter <= 1, "'jitter' doit être entre 0 et 1"
+        self.bounds = {"network": network, "http": http, "rate_limit": rate_limit}
+        self.factor = factor
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.attempts = {kind: 0 for kind in self.bounds}
+        self.errors = collections.Counter()
+        self.waited = 0.0
+
+    @staticmethod
+    def classify(status_code):
+        """Renvoie le type d'erreur associé à un code HTTP (`None` pour une erreur réseau)."""
+        if status_code is None:
+            return "network"
+        if status_code in RATE_LIMIT_CODES:
+            return "rate_limit"
+        return "http"
+
+    def delay(self, kind):
+        """Renvoie l'attente (en secondes) avant la prochaine tentative après une erreur `kind`."""
+        assert kind in self.bounds, f"'kind' doit être dans {list(self.bounds)}"
+        base, cap = self.bounds[kind]
+        delay = min(cap, base * self.factor ** self.attempts[kind])
+        delay *= 1 - self.jitter * self.random.random()
+        self.attempts[kind] += 1
+        self.errors[kind] += 1
+        self.waited += delay
+        return delay
+
+    def reset(self):
+        """Remet à zéro les attentes après une connexion réussie."""
+        self.attempts = {kind: 0 for kind in self.bounds}
 
 
 def start_stream(
@@ -272,6 +699,8 @@ def start_stream(
     fprefix="streamer",
     path="",
     verbose=False,
+    policy=None,
+    **kwargs,
 ):
     r"""
     Cette fonction lance le stream pour la durée donnée.
@@ -282,6 +711,10 @@ def start_stream(
     Les arguments `fprefix`, `path` et `verbose` sont passés 
     dans une instance de la classe `SListener`.
 
+    En cas d'erreur (code HTTP, erreur réseau, timeout ou connexion fermée par Twitter),
+    le stream se reconnecte après une attente donnée par `policy`
+    et continue d'écrire dans le même fichier.
+
     Args:
         liste_mots (list): 
             Liste des mots à tracker.    
@@ -313,6 +746,19 @@ def start_stream(
         verbose (bool, optional): 
             Si `True`, affiche un point tout les 50 tweets traités ou une barre de progression si `nb>0`.    
             Par défaut : `False`.
+
+        policy (ReconnectPolicy, optional): 
+            Calcule l'attente avant chaque reconnexion.    
+            Par défaut : `None` (`ReconnectPolicy()`).
+
+        **kwargs (optional): 
+            Autres arguments à passer à `SListener`,
+            par exemple `max`, `max_bytes`, `max_time` ou `compression`.
+
+    Returns:
+        dict: Les mesures du stream : `duration` et `downtime` (en secondes),
+            `connections`, `reconnects`, `errors` (nombre d'erreurs par type),
+            `waited` (attente totale avant les reconnexions) et `written`.
     """
     wrong_words = [mot for mot in liste_mots if type(mot) is not str]
     if wrong_words:
@@ -321,45 +767,327 @@ def start_stream(
     if not isinstance(credentials, CredentialsClass):
         raise utils.CredentialsClassType(type=type(credentials))
 
+    if policy is None:
+        policy = ReconnectPolicy()
+
     start = time.time()
 
     if verbose:
         print("Début du stream")
 
-    while True:
-        try:
-            # Instantiate the SListener object
-            listen = SListener(
-                credentials,
-                fprefix=fprefix,
-                path=path,
-                verbose=verbose,
-                start=start,
-                timeout=timeout,
-                nb=nb,
-            )
-            # Instantiate the Stream object
-            stream = tweepy.Stream(credentials.auth, listen)
-            # Begin collecting data
-            stream.filter(track=liste_mots)
-        except Exception as e:
+    # Le même listener (et donc le même fichier) est gardé entre les reconnexions
+    listen = SListener(
+        credentials,
+        fprefix=fprefix,
+        path=path,
+        verbose=verbose,
+        start=start,
+        timeout=timeout,
+        nb=nb,
+        **kwargs,
+    )
+
+    try:
+        while True:
+            connections = listen.connections
+            try:
+                stream = PolicyStream(credentials.auth, listen)
+                stream.filter(track=liste_mots)
+                # `filter` ne rend la main que si la connexion a été arrêtée
+                kind = policy.classify(listen.last_error)
+                error = (
+                    "code HTTP %s" % listen.last_error
+                    if listen.last_error is not None
+                    else "connexion fermée"
+                )
+            except Exception as e:
+                if listen.write_error is not None:
+                    # Les tweets ne peuvent plus être écrits : inutile de se reconnecter
+                    raise
+                kind = "network"
+                error = str(e)
+
+            if listen.disconnected_at is None:
+                listen.disconnected_at = time.time()
+            if listen.connections > connections:
+                # La connexion avait réussi : repart des attentes initiales
+                policy.reset()
+
+            delay = policy.delay(kind)
             print("")
-            print(sys.stderr, "Erreur: " + str(e))
-            print("Pause de 15 min avant le prochain essai de streaming")
-            time.sleep(300)
-            for i in range(1, 3):
-                print("Il reste %s min" % (15 - 5 * i))
-                time.sleep(300)
-            print("Pause terminée")
-            continue
+            print("Erreur: " + error, file=sys.stderr)
+            print("Pause de %.1f s avant le prochain essai de streaming" % delay)
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listen.close()
+
+    if listen.disconnected_at is not None:
+        listen.downtime += time.time() - listen.disconnected_at
+        listen.disconnected_at = None
+
+    duration = time.time() - start
+    print("Le stream a duré : " + str(round(duration / (60 * 60), 2)) + "h")
+    print(
+        "Reconnexions : %d, temps déconnecté : %.1f s"
+        % (sum(policy.errors.values()), listen.downtime)
+    )
+    print("Fin du stream")
+
+    return {
+        "duration": duration,
+        "connections": listen.connections,
+        "reconnects": sum(policy.errors.values()),
+        "errors": dict(policy.errors),
+        "downtime": listen.downtime,
+        "waited": policy.waited,
+        "written": listen.written,
+    }
+
+
+# Stream réparti sur plusieurs connexions
+def split_keywords(liste_mots, n):
+    """
+    Répartit une liste de mots en `n` listes de tailles proches.
+
+    Args:
+        liste_mots (list): Liste des mots à tracker.
+
+        n (int): Nombre de listes.
+
+    Returns:
+        list: Liste des `n` listes de mots (certaines sont vides s'il y a moins de `n` mots).
+    """
+    assert n > 0, "'n' doit être positif"
+    return [liste_mots[i::n] for i in range(n)]
+
+
+class TweetDeduplicator:
+    def __init__(self, maxsize=100000):
+        """
+        Garde en mémoire les identifiants des derniers tweets reçus pour ignorer les doublons.
+
+        Peut être partagé entre plusieurs threads.
+
+        Args:
+            maxsize (int, optional): Nombre maximal d'identifiants gardés.    
+                Par défaut : `100000`.
+
+        Attributes:
+            maxsize (int): Contient le nombre maximal d'identifiants.
+            duplicates (int): Compteur du nombre de doublons trouvés.
+            lock (threading.Lock): Contient le verrou partagé.
+        """
+        self.maxsize = maxsize
+        self.duplicates = 0
+        self.lock = threading.Lock()
+        self._ids = collections.OrderedDict()
+
+    def seen(self, tweet_id):
+        """Renvoie `True` si `tweet_id` a déjà été vu, et l'enregistre sinon."""
+        with self.lock:
+            if tweet_id in self._ids:
+                self.duplicates += 1
+                return True
+            self._ids[tweet_id] = None
+            if len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+            return False
+
+
+# Identifiant d'un tweet (la première clé `id` du json)
+_ID_EXPR = re.compile(r'"id":\s*(\d+)')
+
+
+class ShardListener(tweepy.StreamListener):
+    def __init__(self, listener, dedup, stop, shard=0, policy=None):
+        """
+        Classe qui reçoit les tweets d'une connexion et les transmet à un `SListener` commun.
+
+        Les tweets déjà reçus par une autre connexion sont ignorés.    
+        Une erreur arrête la connexion : `start_sharded_stream` la relance après l'attente donnée par `policy`.
+
+        Args:
+            listener (SListener): Le listener commun qui écrit les tweets.
+
+            dedup (TweetDeduplicator): Les identifiants des tweets déjà reçus.
+
+            stop (threading.Event): Événement activé quand le stream doit s'arrêter.
+
+            shard (int, optional): Numéro de la connexion.    
+                Par défaut : `0`.
+
+            policy (ReconnectPolicy, optional): Calcule l'attente avant chaque reconnexion.    
+                Par défaut : `None` (`ReconnectPolicy()`).
+
+        Attributes:
+            received (int): Compteur du nombre de tweets reçus par cette connexion.
+            last_error (int): Contient le dernier code d'erreur HTTP reçu, ou `None`.
+            connections (int): Compteur du nombre de connexions.
+        """
+        super().__init__(api=listener.api)
+        self.listener = listener
+        self.dedup = dedup
+        self.stop = stop
+        self.shard = shard
+        self.policy = policy if policy is not None else ReconnectPolicy()
+        self.received = 0
+        self.last_error = None
+        self.connections = 0
+
+    def on_connect(self):
+        self.connections += 1
+        self.last_error = None
+        self.policy.reset()
+
+    def on_data(self, data):
+        if message_type(data) == "status":
+            self.received += 1
+            match = _ID_EXPR.search(data)
+            if match and self.dedup.seen(match.group(1)):
+                return
+
+        try:
+            with self.dedup.lock:
+                return self.listener.on_data(data)
         except KeyboardInterrupt:
-            print(
-                "Le stream a duré : "
-                + str(round((time.time() - start) / (60 * 60), 2))
-                + "h"
-            )
-            print("Fin du stream")
-            return
+            # Nombre de tweets ou durée atteint
+            self.stop.set()
+            return False
+
+    def on_error(self, status_code):
+        print(
+            f"Shard {self.shard}: error with status code:", status_code, file=sys.stderr
+        )
+        # Arrête la connexion : `start_sharded_stream` choisit l'attente avant de la relancer
+        self.last_error = status_code
+        return False
+
+    def on_timeout(self):
+        print(f"Shard {self.shard}: timeout...", file=sys.stderr)
+        self.last_error = None
+        return False
+
+
+def start_sharded_stream(
+    liste_mots,
+    credentials_list,
+    nb=0,
+    timeout=None,
+    fprefix="streamer",
+    path="",
+    verbose=False,
+    policy=ReconnectPolicy,
+    seen_size=100000,
+    **kwargs,
+):
+    r"""
+    Lance un stream réparti sur plusieurs connexions, une par élément de `credentials_list`.
+
+    La liste de mots est répartie entre les connexions (voir `split_keywords`),
+    les tweets de toutes les connexions sont dédupliqués (par identifiant)
+    puis écrits par un seul `SListener`.    
+    Une connexion qui s'arrête sur une erreur est relancée après une attente
+    donnée par sa propre `ReconnectPolicy`.
+
+    Args:
+        liste_mots (list): 
+            Liste des mots à tracker.    
+            Doit contenir des `str`.
+
+        credentials_list (list): 
+            Liste d'instances de `CredentialsClass`, une par connexion.
+
+        nb, timeout, fprefix, path, verbose: 
+            Voir `start_stream`.
+
+        policy (callable, optional): 
+            Fonction sans argument qui crée la `ReconnectPolicy` de chaque connexion,
+            par exemple `functools.partial(ReconnectPolicy, http=(1, 60))`.    
+            Par défaut : `ReconnectPolicy`.
+
+        seen_size (int, optional): 
+            Nombre d'identifiants de tweets gardés pour la déduplication.    
+            Par défaut : `100000`.
+
+        **kwargs (optional): 
+            Autres arguments à passer à `SListener`.
+    """
+    wrong_words = [mot for mot in liste_mots if type(mot) is not str]
+    if wrong_words:
+        raise utils.WordType(wrong_words=wrong_words)
+
+    for credentials in credentials_list:
+        if not isinstance(credentials, CredentialsClass):
+            raise utils.CredentialsClassType(type=type(credentials))
+
+    start = time.time()
+    listen = SListener(
+        credentials_list[0],
+        fprefix=fprefix,
+        path=path,
+        verbose=verbose,
+        start=start,
+        timeout=timeout,
+        nb=nb,
+        **kwargs,
+    )
+    dedup = TweetDeduplicator(maxsize=seen_size)
+    stop = threading.Event()
+
+    shards = [
+        (credentials, words)
+        for credentials, words in zip(
+            credentials_list, split_keywords(liste_mots, len(credentials_list))
+        )
+        if words
+    ]
+    streams = []
+    for i, (credentials, words) in enumerate(shards):
+        shard_listener = ShardListener(listen, dedup, stop, shard=i, policy=policy())
+        streams.append(PolicyStream(credentials.auth, shard_listener, daemon=True))
+
+    if verbose:
+        print(f"Début du stream sur {len(streams)} connexions")
+
+    try:
+        for stream, (credentials, words) in zip(streams, shards):
+            stream.filter(track=words, is_async=True)
+
+        # Surveille les connexions et relance celles qui se sont arrêtées
+        retry_at = [None] * len(streams)
+        while not stop.wait(1):
+            if listen.write_error is not None:
+                # Erreur d'écriture, relancée par `listen.close`
+                break
+            for i, (stream, (credentials, words)) in enumerate(zip(streams, shards)):
+                if stream.running:
+                    continue
+                shard_listener = stream.listener
+                if retry_at[i] is None:
+                    kind = shard_listener.policy.classify(shard_listener.last_error)
+                    delay = shard_listener.policy.delay(kind)
+                    print(
+                        f"Shard {i}: connexion arrêtée, nouvel essai dans {delay:.1f} s",
+                        file=sys.stderr,
+                    )
+                    retry_at[i] = time.time() + delay
+                elif time.time() >= retry_at[i]:
+                    retry_at[i] = None
+                    stream.filter(track=words, is_async=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for stream in streams:
+            stream.disconnect()
+        listen.close()
+
+    print(
+        "Le stream a duré : " + str(round((time.time() - start) / (60 * 60), 2)) + "h"
+    )
+    print(f"Tweets écrits : {listen.written}, doublons ignorés : {dedup.duplicates}")
+    print("Fin du stream")
 
 
 # Lancement du stream
@@ -406,6 +1134,21 @@ if __name__ == "__main__":
             help="Le numero de la liste de 'listes_mots' à utiliser.",
         )
         parser.add_argument("--prefix", help="Le prefix du noms des fichiers.")
+        parser.add_argument(
+            "-c",
+            "--compression",
+            choices=["gzip", "zstd"],
+            help="La compression des fichiers.",
+        )
+        parser.add_argument(
+            "--lang", nargs="+", help="Les langues des tweets à garder.",
+        )
+        parser.add_argument(
+            "--no-retweets",
+            dest="retweets",
+            action="store_false",
+            help="Ignore les retweets.",
+        )
         args = parser.parse_args()
 
         credentials = CredentialsClass(_credentials.credentials)
@@ -423,4 +1166,8 @@ if __name__ == "__main__":
             + str(args.liste),  # À modifier en fonction de la liste selectionnée
             path=args.path,  # À modifier selon l'utilisateur
             verbose=args.verbose,  # Selon les préférences
+            compression=args.compression,  # Compression des fichiers
+            status_filter=make_filter(
+                lang=args.lang, retweets=args.retweets
+            ),  # Filtre des tweets avant l'écriture
         )
@@ -68,7 +68,7 @@ def add_max(
     def _add_max(row):
         state = row[var_state_gdf]
         if any(df[var_state_df] == state):
-            df2 = df[df[var_state_df] == state].groupby(label).describe()
+            df2 = df[df[var_state_df] == state].groupby(label, observed=True).describe()
             m = df2["user-id"]["count"]
             return m.idxmax()
         return np.nan
@@ -102,7 +102,9 @@ def add_stats_sentiment(
     Returns:
         geopandas.geodataframe: Modifie et renvoie la gdf des États avec les stats descriptive sur le compound du texte.
     """
-    df2 = df.groupby(var_state_df).describe()[sent_var][["count", "mean", "std"]]
+    df2 = df.groupby(var_state_df, observed=True).describe()[sent_var][
+        ["count", "mean", "std"]
+    ]
     df_state = df_state.merge(
         df2, how="left", left_on=[var_state_gdf], right_on=[var_state_df]
     )
@@ -151,7 +153,7 @@ def save_hist(
     def _add_image(row):
         state = row[var_state_gdf]
         if any(df[var_state_df] == state):
-            df2 = df[df[var_state_df] == state].groupby(label).describe()
+            df2 = df[df[var_state_df] == state].groupby(label, observed=True).describe()
             m = df2["user-id"]["count"]
             plt.figure(figsize=(10,10))
             fig = m.plot(
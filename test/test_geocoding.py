@@ -0,0 +1,157 @@
+# Import les modules
+import json
+import time
+import asyncio
+import threading
+import collections
+import http.server
+import urllib.parse
+import pytest
+import pandas as pd
+from geopy.geocoders import Nominatim
+import projet.geocoding as geocoding
+import projet.processing as processing
+
+
+# Tests
+@pytest.fixture
+def gazetteer(tmp_path):
+    """Crée un petit gazetteer à partir d'un fichier `.csv`."""
+    csv_path = tmp_path / "uscities.csv"
+    pd.DataFrame(
+        {
+            "city": ["Austin", "Chicago", "Springfield", "Springfield"],
+            "state_name": ["Texas", "Illinois", "Missouri", "Illinois"],
+            "lat": [30.3, 41.8, 37.2, 39.8],
+            "lng": [-97.7, -87.7, -93.3, -89.6],
+            "population": [1e6, 2.7e6, 1.7e5, 1.1e5],
+        }
+    ).to_csv(csv_path, index=False)
+    return geocoding.build_gazetteer(
+        str(csv_path), str(tmp_path / "gazetteer.db"), population_col="population"
+    )
+
+
+def test_gazetteer_lookup(gazetteer):
+    """Test la recherche dans le gazetteer (la ville la plus peuplée est choisie)."""
+    assert gazetteer.lookup("austin") == ("Texas", 30.3, -97.7)
+    assert gazetteer.lookup("Springfield")[0] == "Missouri"
+    assert gazetteer.lookup("Paris") is None
+
+
+def test_get_states1_offline(gazetteer):
+    """Test que `get_states1` fonctionne hors ligne avec le gazetteer."""
+    df = pd.DataFrame(
+        {"user-location": ["Austin", None, "Chicago", "Austin", "Nowhere"]}
+    )
+    df = processing.get_states1(df, gazetteer=gazetteer)
+    assert list(df["state2"][[0, 2, 3]]) == ["Texas", "Illinois", "Texas"]
+    assert df["state2"][[1, 4]].isnull().all()
+    assert df["coord"][0] == (30.3, -97.7)
+
+
+def test_geocode_cache(tmp_path):
+    """Test que le cache garde les réponses, y compris les villes introuvables."""
+    path = str(tmp_path / "geocode.db")
+    geocode_cache = geocoding.GeocodeCache(path)
+    geocode_cache["Austin"] = ("Texas", 30.3, -97.7)
+    geocode_cache["Nowhere"] = None
+    geocode_cache.close()
+
+    geocode_cache = geocoding.GeocodeCache(path)
+    assert len(geocode_cache) == 2
+    assert geocode_cache["Austin"] == ("Texas", 30.3, -97.7)
+    assert "Nowhere" in geocode_cache and geocode_cache["Nowhere"] is None
+    assert "Paris" not in geocode_cache
+
+
+@pytest.fixture
+def stub_server():
+    """Lance un serveur HTTP local qui imite l'API de recherche de Nominatim."""
+    requests_count = collections.Counter()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            city = query["q"][0]
+            requests_count[city] += 1
+            if city == "Slow" and requests_count[city] == 1:
+                time.sleep(0.5)  # Provoque un timeout à la première tentative
+            body = []
+            if city in ["Austin", "Slow"]:
+                body = [
+                    {
+                        "lat": "30.26",
+                        "lon": "-97.74",
+                        "display_name": f"{city}, Travis County, Texas, United States",
+                    }
+                ]
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_address[1]}", requests_count
+    server.shutdown()
+
+
+def test_async_geocoder(stub_server, tmp_path):
+    """Test le géocodeur concurrent : déduplication, reprises et cache."""
+    domain, requests_count = stub_server
+    geolocator = Nominatim(domain=domain, scheme="http", timeout=0.2, user_agent="test")
+    geocode_cache = geocoding.GeocodeCache(str(tmp_path / "geocode.db"))
+    geocoder = geocoding.AsyncGeocoder(
+        geolocator, rate=100, backoff=0.01, cache=geocode_cache
+    )
+    results = geocoder.run(["Austin", "Nowhere", "Austin", "Slow"])
+    assert results["Austin"] == ("Texas", 30.26, -97.74)
+    assert results["Slow"] == ("Texas", 30.26, -97.74)
+    assert results["Nowhere"] is None
+    assert requests_count["Austin"] == 1 and requests_count["Slow"] == 2
+    assert geocoder.failed == [] and len(geocode_cache) == 3
+
+    # Les réponses en cache ne refont pas de requête
+    df = pd.DataFrame({"user-location": ["Austin", "Austin"]})
+    geocoder = geocoding.AsyncGeocoder(geolocator, rate=100, cache=geocode_cache)
+    df = processing.get_states1(df, geocoder=geocoder)
+    assert list(df["state2"]) == ["Texas", "Texas"]
+    assert requests_count["Austin"] == 1
+
+
+def test_async_geocoder_running_loop(stub_server, tmp_path):
+    """Test `run` depuis une boucle qui tourne déjà (notebook), avec un cache SQLite."""
+    domain, requests_count = stub_server
+    geolocator = Nominatim(domain=domain, scheme="http", timeout=0.2, user_agent="test")
+    geocode_cache = geocoding.GeocodeCache(str(tmp_path / "geocode.db"))
+    geocode_cache["Chicago"] = ("Illinois", 41.8, -87.7)
+    geocoder = geocoding.AsyncGeocoder(geolocator, rate=100, cache=geocode_cache)
+
+    async def _main():
+        return geocoder.run(["Austin", "Chicago", "Nowhere"])
+
+    results = asyncio.run(_main())
+    assert results["Austin"] == ("Texas", 30.26, -97.74)
+    assert results["Chicago"] == ("Illinois", 41.8, -87.7)
+    assert results["Nowhere"] is None
+    assert requests_count["Chicago"] == 0
+    assert len(geocode_cache) == 3 and geocode_cache["Austin"] == results["Austin"]
+
+
+def test_token_bucket():
+    """Test que le limiteur de débit espace les requêtes."""
+    bucket = geocoding.TokenBucket(rate=20)
+
+    async def _acquire_all():
+        for _ in range(5):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(_acquire_all())
+    assert time.monotonic() - start >= 0.15
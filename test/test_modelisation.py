@@ -0,0 +1,129 @@
+# Import les modules
+import pytest
+import numpy as np
+import pandas as pd
+import projet.modelisation as model
+import projet.cache as cache
+import projet.projet_utils as utils
+
+
+def _blobs(n=300, seed=0):
+    """Renvoie une dataframe avec trois groupes bien séparés."""
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0, 0], [8, 8], [0, 8]])
+    points = np.concatenate(
+        [center + rng.normal(size=(n // 3, 2)) for center in centers]
+    )
+    return pd.DataFrame(
+        {"user-id": range(len(points)), "x": points[:, 0], "y": points[:, 1]}
+    )
+
+
+def test_elbow_parallel():
+    """Test que la méthode du coude en parallèle donne le même résultat et réutilise le modèle."""
+    df = _blobs()
+    X = model.FeatureMatrix(["x", "y"]).fit_transform(df)
+    kwargs = {"init": "random", "n_init": 3, "random_state": 0}
+    sequential = model.elbow_search(X, max_cluster=6, **kwargs)
+    parallel = model.elbow_search(X, max_cluster=6, n_jobs=2, **kwargs)
+    assert sequential["sse"] == parallel["sse"]
+    assert sequential["n_cluster"] == 3 and len(parallel["fit_time"]) == 6
+
+    df, info = model.KM(df, max_cluster=6, n_init=3, random_state=0, return_info=True)
+    assert info["n_cluster"] == 3 and info["sse"] == sequential["sse"]
+    assert df["kmlabel"].nunique() == 3
+    assert (df["kmlabel"] == info["model"].labels_).all()
+
+
+def test_feature_matrix():
+    """Test la matrice float32 normalisée sur place et la réutilisation de la normalisation."""
+    df = _blobs()
+    features = model.FeatureMatrix(["x", "y"])
+    X = features.fit_transform(df)
+    assert X.dtype == np.float32 and X.flags["C_CONTIGUOUS"]
+    expected = model.standardize(df, ["x", "y"]).to_numpy()
+    np.testing.assert_allclose(X, expected, rtol=1e-5, atol=1e-5)
+
+    # Un nouveau paquet est normalisé sans réapprendre
+    mean = features.scaler.mean_.copy()
+    new = features.transform(df.iloc[:10])
+    np.testing.assert_allclose(new, X[:10])
+    assert (features.scaler.mean_ == mean).all()
+
+
+def test_streaming_km(tmp_path):
+    """Test l'entraînement par paquets depuis un jeu de données et la mise à jour."""
+    df = _blobs(n=600)
+    df = df.sample(frac=1, random_state=0).reset_index(drop=True)
+    store_dir = str(tmp_path / "dataset")
+    manifest = cache.load_manifest(store_dir)
+    for i in range(0, 450, 150):
+        cache.save_part(df.iloc[i : i + 150], store_dir, manifest)
+    cache.save_manifest(manifest, store_dir)
+
+    km = model.StreamingKM(3, vars=["x", "y"], batch_size=64, random_state=0)
+    km.fit_dataset(store_dir)
+    assert km.n_seen == 450
+
+    new = df.iloc[450:].copy()
+    new.loc[new.index[0], "x"] = np.nan
+    km.update(new)
+    assert km.n_seen == 599
+    assert new["kmlabel"].isna().sum() == 1
+    assert new["kmlabel"].dtype == "Int32"
+
+    # Les groupes bien séparés sont retrouvés
+    full = km.predict(df.iloc[1:])
+    batch = model.KM(df.iloc[1:].copy(), n_cluster=3, vars=["x", "y"])["kmlabel"]
+    assert pd.crosstab(full, batch).gt(0).sum().eq(1).all()
+    df = model.KM(df, n_cluster=3, vars=["x", "y"], backend="minibatch")
+    assert df["kmlabel"].nunique() == 3
+
+
+def test_select_k_sample():
+    """Test le choix du nombre de clusters sur des échantillons stratifiés."""
+    df = _blobs(n=900)
+    df["group"] = np.repeat(["a", "b", "c"], 300)
+    sample = model.stratified_sample(900, 90, df["group"], random_state=0)
+    assert len(sample) == 90
+    assert df["group"].iloc[sample].value_counts().eq(30).all()
+
+    X = model.standardize(df, ["x", "y"]).to_numpy()
+    info = model.select_k(X, max_cluster=6, n_samples=3, sample_size=150, n_init=2)
+    assert info["n_cluster"] == 3 and info["confidence"] == 1
+    assert np.isnan(info["silhouette_mean"][0]) and len(info["sse_mean"]) == 6
+
+    df, info = model.KM(
+        df,
+        vars=["x", "y"],
+        max_cluster=6,
+        selection="sample",
+        sample_size=150,
+        strata_var="group",
+        return_info=True,
+    )
+    assert info["n_cluster"] == 3 and df["kmlabel"].nunique() == 3
+
+
+def test_cluster_model_save_load(tmp_path):
+    """Test l'enregistrement du modèle et l'étiquetage de nouveaux tweets sans réentraîner."""
+    df = _blobs()
+    path = str(tmp_path / "km.joblib")
+    df = model.KM(df, n_cluster=3, vars=["x", "y"], model_path=path)
+
+    km = model.ClusterModel.load(path, vars=["x", "y"])
+    new = df.copy()
+    new.loc[0, "x"] = np.nan
+    labels = km.predict(new)
+    assert labels.dtype == "Int32" and pd.isna(labels[0])
+    assert (labels[1:] == df["kmlabel"][1:]).all()
+    assert km.predict(df).astype(int).equals(df["kmlabel"].astype(int))
+
+    with pytest.raises(utils.FeatureMismatch):
+        model.ClusterModel.load(path, vars=["y", "x"])
+
+    streaming = model.StreamingKM(3, vars=["x", "y"], batch_size=64)
+    streaming.fit_chunks(lambda: [df])
+    streaming.to_cluster_model().save(path)
+    km = model.ClusterModel.load(path)
+    assert (km.predict(df) == streaming.predict(df)).all()
@@ -0,0 +1,85 @@
+# Import les modules
+import json
+import projet.processing as processing
+import projet.pipeline as pipeline
+
+
+def _tweet(i):
+    """Renvoie un tweet minimal au format de l'API."""
+    return {
+        "id": i,
+        "created_at": "Tue Nov 03 20:00:%02d +0000 2020" % i,
+        "text": "Trump %d" % i if i % 2 else "Biden %d" % i,
+        "lang": "en",
+        "user": {"id": i, "location": "Austin, Texas", "description": "Joe"},
+    }
+
+
+def test_pipeline_cache(tmp_path):
+    """Test que seules les étapes dont un paramètre a changé (et les suivantes) sont relancées."""
+    path = tmp_path / "streamer.json"
+    with open(path, "w") as fh:
+        for i in range(20):
+            fh.write(json.dumps(_tweet(i)) + "\n")
+
+    steps = [
+        (
+            "full_text",
+            processing.get_full_text,
+            {"text_vars": ["text"], "drop_vars": False},
+        ),
+        (
+            "politics",
+            processing.add_politics,
+            {"text_vars": ["full_text"], "trump_word": "Trump"},
+        ),
+        ("states", processing.get_states, {"location_var": "user-location"}),
+    ]
+    columns = [["text"], ["lang"], ["user", "location"], ["user", "description"]]
+    pipe = pipeline.Pipeline(steps, columns=columns, cache_dir=str(tmp_path / "cache"))
+    df = pipe.run(path_list=[str(path)])
+    stages = ["load", "clean", "full_text", "politics", "states"]
+    assert list(pipe.report.index) == stages
+    assert not pipe.report["cached"].any()
+    assert df["full_text-contains_trump"].sum() == 10
+    assert (df["state"] == "Texas").all()
+
+    # Tout vient du cache
+    df_cached = pipe.run(path_list=[str(path)])
+    assert pipe.report["cached"].all()
+    assert df_cached.equals(df)
+
+    # Seules 'politics' et 'states' sont relancées
+    pipe.set_params("politics", trump_word="Biden")
+    df = pipe.run(path_list=[str(path)])
+    assert list(pipe.report["cached"]) == [True, True, True, False, False]
+    assert df["full_text-contains_trump"].sum() == 10
+    assert not df["full_text-contains_trump"].equals(
+        df_cached["full_text-contains_trump"]
+    )
+
+
+def test_pipeline_cache_objects(tmp_path):
+    """Test que les étapes avec un objet en paramètre sont reprises du cache."""
+    path = tmp_path / "streamer.json"
+    with open(path, "w") as fh:
+        for i in range(5):
+            fh.write(json.dumps(_tweet(i)) + "\n")
+
+    columns = [["text"], ["user", "location"]]
+    for cached in [False, True]:
+        steps = [
+            (
+                "states",
+                processing.get_states,
+                {
+                    "location_var": "user-location",
+                    "resolver": processing.StateResolver(),
+                },
+            )
+        ]
+        pipe = pipeline.Pipeline(
+            steps, columns=columns, cache_dir=str(tmp_path / "cache")
+        )
+        pipe.run(path_list=[str(path)])
+        assert list(pipe.report["cached"]) == [cached] * 3
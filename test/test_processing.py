@@ -0,0 +1,448 @@
+# Import les modules
+import os
+import re
+import gzip
+import json
+import importlib.util
+import pytest
+import numpy as np
+import pandas as pd
+import projet.processing as processing
+import projet.cache as cache
+import projet.projet_utils as utils
+
+
+def _tweet(i, text="Hello", location="Austin, Texas"):
+    """Renvoie un tweet minimal au format de l'API."""
+    return {
+        "id": i,
+        "created_at": "Tue Nov 03 20:00:%02d +0000 2020" % (i % 60),
+        "text": text,
+        "lang": "en",
+        "user": {
+            "id": 100 + i % 3,
+            "name": "user",
+            "location": location,
+            "description": "I like Biden",
+            "followers_count": i,
+        },
+        "place": None,
+    }
+
+
+# Tests
+@pytest.fixture
+def json_files(tmp_path):
+    """Crée trois fichiers `.json` de tweets et renvoie la liste des chemins."""
+    path_list = []
+    for f in range(3):
+        path = tmp_path / ("streamer_%d.json" % f)
+        with open(path, "w") as fh:
+            for i in range(10 * f, 10 * f + 10):
+                fh.write(json.dumps(_tweet(i, text="Trump %d" % i)) + "\n")
+        path_list.append(str(path))
+    return path_list
+
+
+def test_tweet_json_to_df(json_files):
+    """Test que tous les tweets des fichiers sont chargés."""
+    df = processing.tweet_json_to_df(path_list=json_files)
+    assert len(df) == 30
+    assert list(df["id"]) == list(range(30))
+
+
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_tweet_json_to_df_truncated_gzip(json_files, tmp_path, n_jobs):
+    """Test la lecture d'un fichier `.json.gz` en cours d'écriture (fin tronquée)."""
+    data = "".join(json.dumps(_tweet(i)) + "\r\n" for i in range(30, 40))
+    data += json.dumps(_tweet(40))[:20]
+    # Sans le bloc de fin (crc et taille), comme un fichier pas encore fermé
+    path = tmp_path / "streamer_3.json.gz"
+    path.write_bytes(gzip.compress(data.encode("utf-8"))[:-8])
+    df = processing.tweet_json_to_df(path_list=json_files + [str(path)], n_jobs=n_jobs)
+    assert sorted(df["id"]) == list(range(40))
+
+
+def test_tweet_json_to_df_parallel(json_files):
+    """Test que le chargement parallèle donne la même dataframe que le séquentiel."""
+    df = processing.tweet_json_to_df(path_list=json_files)
+    df_par = processing.tweet_json_to_df(path_list=json_files, n_jobs=2)
+    assert df_par[["id", "text"]].equals(df[["id", "text"]])
+    assert list(df_par.index) == list(range(30))
+
+
+def test_compile_columns():
+    """Test que l'extraction renvoie `np.nan` pour les variables absentes."""
+    extract = processing.compile_columns([["text"], ["user", "id"], ["place", "name"]])
+    row = extract(_tweet(1))
+    assert row["text"] == "Hello" and row["user-id"] == 101
+    assert row["place-name"] != row["place-name"]  # np.nan
+
+
+def test_projection_clean_df(json_files):
+    """Test que la projection à la lecture donne le même résultat que `clean_df`."""
+    columns = [
+        ["text"],
+        ["lang"],
+        ["user", "id"],
+        ["user", "location"],
+        ["place", "name"],
+    ]
+    df_full = processing.clean_df(
+        processing.tweet_json_to_df(path_list=json_files), columns=columns
+    )
+    df_proj = processing.tweet_json_to_df(path_list=json_files, columns=columns)
+    assert "user" not in df_proj
+    df_proj = processing.clean_df(df_proj, columns=columns)
+    pd.testing.assert_frame_equal(df_full, df_proj)
+
+
+def test_clean_df_nested():
+    """Test l'extraction des variables imbriquées, y compris les valeurs absentes."""
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "user": [{"id": 10, "loc": {"city": "Paris"}}, None, {"id": 30, "loc": 5}],
+            "lang": ["en", "fr", "en"],
+        }
+    )
+    columns = [["user", "loc", "city"], ["lang"], ["user", "id"]]
+    clean = processing.clean_df(df, date=None, columns=columns)
+    assert list(clean) == ["user-loc-city", "lang", "user-id"]
+    assert list(clean.index) == [1, 2, 3]
+    assert clean["user-loc-city"].tolist()[0] == "Paris"
+    assert clean["user-loc-city"].isna().tolist() == [False, True, True]
+    assert clean["user-id"].tolist()[::2] == [10, 30]
+
+
+def test_process_files_cache(json_files, tmp_path):
+    """Test que le cache est réutilisé et que seuls les fichiers modifiés sont recalculés."""
+    cache_dir = str(tmp_path / "cache")
+    columns = [["text"], ["user", "location"]]
+    steps = [(processing.get_full_text, {"text_vars": ["text"], "drop_vars": False})]
+    df = processing.process_files(
+        path_list=json_files, columns=columns, steps=steps, cache_dir=cache_dir
+    )
+    assert len(os.listdir(cache_dir)) == 2 * len(json_files)
+
+    # Modifie un seul fichier
+    with open(json_files[0], "a") as fh:
+        fh.write(json.dumps(_tweet(99)) + "\n")
+    df2 = processing.process_files(
+        path_list=json_files, columns=columns, steps=steps, cache_dir=cache_dir
+    )
+    assert len(os.listdir(cache_dir)) == 2 * len(json_files) + 2
+    assert len(df2) == len(df) + 1
+    assert list(df2["full_text"][df.index]) == list(df["full_text"])
+
+
+def test_cache_key_objects(json_files):
+    """Test que les objets en paramètre donnent une clé stable, ou une erreur."""
+    path = json_files[0]
+    key = cache.cache_key(path, [("states", {"resolver": processing.StateResolver()})])
+    assert key == cache.cache_key(
+        path, [("states", {"resolver": processing.StateResolver()})]
+    )
+    assert key != cache.cache_key(
+        path, [("states", {"resolver": processing.StateResolver(seed=1)})]
+    )
+    with pytest.raises(TypeError):
+        cache.cache_key(path, [("step", {"param": object()})])
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_cache_round_trip(tmp_path, fmt):
+    """Test que le cache rend la même dataframe que le traitement, avec `liste_1`."""
+    place = {
+        "name": "Austin",
+        "full_name": "Austin, TX",
+        "place_type": "city",
+        "country_code": "US",
+        "country": "United States",
+        "bounding_box": {"type": "Polygon", "coordinates": [[[-97.9, 30.1]]]},
+    }
+    path = tmp_path / "streamer.json"
+    with open(path, "w") as fh:
+        for i in range(6):
+            tweet = _tweet(i)
+            if i % 2:
+                tweet["place"] = place
+            fh.write(json.dumps(tweet) + "\n")
+
+    cache_dir = str(tmp_path / "cache")
+    df = processing.process_files(path_list=[str(path)], cache_dir=cache_dir, fmt=fmt)
+    df_cached = processing.process_files(
+        path_list=[str(path)], cache_dir=cache_dir, fmt=fmt
+    )
+    assert df.equals(df_cached)
+    assert df_cached["place-bounding_box-coordinates"][1] == [[[-97.9, 30.1]]]
+
+
+def test_update_dataset(json_files, tmp_path):
+    """Test que seules les nouvelles lignes sont traitées et ajoutées au jeu de données."""
+    store_dir = str(tmp_path / "dataset")
+    columns = [["text"], ["user", "location"]]
+    df_new = processing.update_dataset(store_dir, path_list=json_files, columns=columns)
+    assert len(df_new) == 30
+    assert processing.update_dataset(store_dir, path_list=json_files) is None
+
+    # Ajoute une ligne complète et une ligne en cours d'écriture
+    with open(json_files[1], "a") as fh:
+        fh.write(json.dumps(_tweet(99)) + "\n" + json.dumps(_tweet(100))[:20])
+    df_new = processing.update_dataset(store_dir, path_list=json_files, columns=columns)
+    assert list(df_new.index) == [99]
+
+    df = cache.load_dataset(store_dir)
+    assert len(df) == 31
+    assert df.index.is_unique
+
+
+def test_update_dataset_compressed(json_files, tmp_path, monkeypatch):
+    """Test que les fichiers compressés inchangés ne sont pas relus."""
+    path_list = []
+    for path in json_files:
+        with open(path) as src, gzip.open(path + ".gz", "wt") as dst:
+            dst.write(src.read())
+        path_list.append(path + ".gz")
+
+    store_dir = str(tmp_path / "dataset")
+    columns = [["text"]]
+    assert len(processing.update_dataset(store_dir, path_list, columns=columns)) == 30
+
+    read_tail = processing._read_tail
+    calls = []
+
+    def _counting_read_tail(path, offset=0):
+        calls.append(path)
+        return read_tail(path, offset)
+
+    monkeypatch.setattr(processing, "_read_tail", _counting_read_tail)
+    assert processing.update_dataset(store_dir, path_list, columns=columns) is None
+    assert calls == []
+
+    # Ajoute un membre gzip avec un nouveau tweet à un seul fichier
+    with gzip.open(path_list[1], "at") as fh:
+        fh.write(json.dumps(_tweet(99)) + "\n")
+    df_new = processing.update_dataset(store_dir, path_list, columns=columns)
+    assert list(df_new.index) == [99] and calls == [path_list[1]]
+
+
+def test_add_sentiment_dedup(tmp_path):
+    """Test que le score dédupliqué et mis en cache est le même que le score ligne par ligne."""
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    texts = ["I love it", "I hate it", None, "I love it"] * 5
+    df = pd.DataFrame({"full_text": texts})
+    path = str(tmp_path / "sentiment.json")
+    sentiment_cache = processing.SentimentCache(maxsize=10, path=path)
+    processing.add_sentiment(
+        df, text_vars=["full_text"], keep_dict=True, cache=sentiment_cache
+    )
+    sid = SentimentIntensityAnalyzer()
+    expected = [sid.polarity_scores(text or "")["compound"] for text in texts]
+    assert list(df["full_text-sentiment-compound"]) == expected
+    assert df["full_text-sentiment"][1] == sid.polarity_scores("I hate it")
+
+    sentiment_cache.save()
+    assert len(processing.SentimentCache(path=path)) == 3
+
+
+def test_sentiment_cache_bounded():
+    """Test que le cache oublie les textes les moins récemment utilisés."""
+    sentiment_cache = processing.SentimentCache(maxsize=2)
+    sentiment_cache.update({"a": 1, "b": 2})
+    sentiment_cache.get("a")
+    sentiment_cache.update({"c": 3})
+    assert sentiment_cache.get("b") is None and sentiment_cache.get("a") == 1
+
+
+def test_state_resolver_matches():
+    """Test que le trie trouve les mêmes états que les expressions régulières."""
+    import re
+    import us
+
+    resolver = processing.StateResolver()
+    regs = [
+        (state.name, re.compile(f"({state.name}|{state.abbr}|{state.name_metaphone})"))
+        for state in us.STATES
+    ]
+    for location in ["Austin, Texas", "Little Rock, Arkansas", "West Virginia", "NY"]:
+        expected = [name for name, reg in regs if reg.search(location)]
+        assert resolver.matches(location) == expected
+
+
+def test_get_states_deterministic():
+    """Test que `get_states` est reproductible et gère les valeurs manquantes."""
+    locations = ["Austin, Texas", None, "Paris", "Kansas City, Kansas, MO"] * 3
+    df = pd.DataFrame({"user-location": locations})
+    states = list(processing.get_states(df)["state"])
+    assert states[0] == "Texas" and states[3] in ["Kansas", "Missouri", "Arkansas"]
+    assert pd.isnull(states[1]) and pd.isnull(states[2])
+    assert states == list(processing.get_states(df.copy(), seed=0)["state"])
+    assert states[3] == states[7] == states[11]
+
+
+def test_add_politics_single_pass():
+    """Test que `add_politics` donne le même résultat que `str.contains`."""
+    texts = ["Trump and Biden", "joe", "Nothing", None, "DONALD donald", "Joe"]
+    df = pd.DataFrame({"full_text": texts})
+    df = processing.add_politics(df, text_vars=["full_text"], count=True)
+    for var, word in [
+        ("contains_trump", "(Trump|Donald|realDonaldTrump|republican)"),
+        ("contains_biden", "(Biden|Joe|JoeBiden|democrat)"),
+    ]:
+        expected = df["full_text"].str.contains(word, case=False)
+        pd.testing.assert_series_equal(
+            df["full_text-" + var], expected, check_names=False
+        )
+    assert df["full_text-contains_trump-count"][4] == 2
+
+    # Les groupes par défaut sont cherchés en un seul passage
+    matcher = processing.KeywordMatcher(
+        {
+            "contains_trump": "(Trump|Donald|realDonaldTrump|republican)",
+            "contains_biden": "(Biden|Joe|JoeBiden|democrat)",
+        }
+    )
+    assert matcher.trie is not None and not matcher.regexes
+
+
+def test_add_politics_groups():
+    """Test l'ajout d'autres groupes de mots-clés."""
+    df = pd.DataFrame({"full_text": ["Trump", "Sanders", "Bernie or Biden"]})
+    df = processing.add_politics(
+        df,
+        text_vars=["full_text"],
+        groups={"trump": "Trump", "biden": "Biden", "sanders": "(Bernie|Sanders)"},
+    )
+    assert list(df["full_text-sanders"]) == [False, True, True]
+    assert df["full_text-trump"].dtype == bool
+
+
+def test_keyword_matcher_overlap():
+    """Test les mots qui se chevauchent et les références arrière, comme `str.contains`."""
+    texts = pd.Series(
+        ["Trump2020 rally", "Trump", "foo", "Donaldemocrat", "joejoebiden JOE", None]
+    )
+    for groups, n_regexes in [
+        ({"trump": "Trump", "trump2020": "Trump2020"}, 0),
+        ({"trump": "(Trump|Donald)", "biden": "(Biden|democrat|Joe|JoeBiden)"}, 0),
+        ({"double": r"(o)\1", "trump": "Trump"}, 1),
+    ]:
+        matcher = processing.KeywordMatcher(groups)
+        assert len(matcher.regexes) == n_regexes
+        counts = matcher.count_series(texts)
+        for j, reg in enumerate(groups.values()):
+            expected = [len(re.findall(reg, text, re.IGNORECASE)) for text in texts[:5]]
+            assert list(counts[:5, j]) == expected
+        assert np.isnan(counts[5]).all()
+
+
+def test_compact_dtypes():
+    """Test la réduction des types et la mémoire économisée."""
+    n = 1000
+    df = pd.DataFrame(
+        {
+            "text": [f"tweet {i}" for i in range(n)],
+            "lang": ["en", "fr"] * (n // 2),
+            "state": ["Texas", None, "Ohio", "Iowa"] * (n // 4),
+            "user-followers_count": [float(i) for i in range(n - 1)] + [np.nan],
+            "full_text-sentiment-compound": np.linspace(-1, 1, n),
+            "flag": [True, False] * (n // 2),
+            "flag_na": pd.Series([True, None] * (n // 2), dtype=object),
+            "user-id": np.arange(n, dtype=np.int64),
+        }
+    )
+    before = df.memory_usage(deep=True).sum()
+    df = processing.compact_dtypes(df)
+    assert df["text"].dtype == object
+    assert df["lang"].dtype == "category" and df["state"].dtype == "category"
+    assert df["state"].isna().sum() == n // 4
+    assert str(df["user-followers_count"].dtype) == "Int16"
+    assert df["full_text-sentiment-compound"].dtype == np.float64
+    assert df["flag"].dtype == bool and str(df["flag_na"].dtype) == "boolean"
+    assert df["user-id"].dtype == np.int16
+    assert 0 < df.attrs["bytes_saved"] == before - df.memory_usage(deep=True).sum()
+
+
+def test_process_chunked(json_files, tmp_path):
+    """Test le traitement par paquets et la reprise avec `update_dataset`."""
+    store_dir = str(tmp_path / "dataset")
+    columns = [["text"], ["user", "location"]]
+    steps = [(processing.get_full_text, {"text_vars": ["text"], "drop_vars": False})]
+    n = processing.process_chunked(
+        store_dir, path_list=json_files, chunksize=7, columns=columns, steps=steps
+    )
+    assert n == 30
+    assert len(cache.load_manifest(store_dir)["parts"]) == 5
+
+    df = cache.load_dataset(store_dir)
+    expected = processing.process_files(
+        path_list=json_files, columns=columns, steps=steps
+    )
+    pd.testing.assert_frame_equal(df, expected)
+
+    # Rien de nouveau, puis une ligne ajoutée
+    assert processing.process_chunked(store_dir, path_list=json_files) == 0
+    with open(json_files[2], "a") as fh:
+        fh.write(json.dumps(_tweet(99)) + "\n")
+    df_new = processing.update_dataset(store_dir, path_list=json_files, columns=columns)
+    assert list(df_new.index) == [99]
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        "gzip",
+        pytest.param(
+            "zstd",
+            marks=pytest.mark.skipif(
+                importlib.util.find_spec("zstandard") is None,
+                reason="'zstandard' n'est pas installé",
+            ),
+        ),
+    ],
+)
+def test_process_chunked_compressed(json_files, tmp_path, compression):
+    """Test le traitement par paquets des fichiers compressés."""
+    path_list = []
+    for path in json_files:
+        compressed = path + utils.COMPRESSIONS[compression]
+        with open(path) as src, utils.open_file(compressed, "w") as dst:
+            dst.write(src.read())
+        path_list.append(compressed)
+
+    store_dir = str(tmp_path / "dataset")
+    columns = [["text"]]
+    n = processing.process_chunked(store_dir, path_list, chunksize=7, columns=columns)
+    assert n == 30
+    df = cache.load_dataset(store_dir)
+    assert sorted(df.index) == list(range(30))
+    assert processing.process_chunked(store_dir, path_list, columns=columns) == 0
+
+
+def test_time_range_sorted(tmp_path):
+    """Test la sélection par recherche dichotomique et le chargement des partitions utiles."""
+    dates = pd.date_range("2020-11-01", periods=96, freq="H", tz="UTC")
+    df = pd.DataFrame(
+        {"created_at": dates[::-1], "n": range(96)}, index=range(1000, 1096)
+    )
+    start, end = "2020-11-02 03:00:00+00:00", "2020-11-02 09:00:00+00:00"
+    expected = processing.select_time_range(df, start, end).sort_values("created_at")
+
+    time_index = processing.TimeIndex(df)
+    pd.testing.assert_frame_equal(time_index.select(start, end), expected)
+    windows = list(time_index.windows(start, end, freq="2H"))
+    assert [len(window) for _, window in windows] == [2, 2, 2]
+
+    store_dir = str(tmp_path / "dates")
+    assert len(cache.save_by_date(df, store_dir, freq="D")) == 4
+    assert cache.partitions_in_range(store_dir, start, end) == ["date=20201102T000000"]
+    pd.testing.assert_frame_equal(
+        processing.load_time_range(store_dir, start, end), expected
+    )
+
+    # Les nouveaux tweets sont ajoutés aux partitions existantes
+    cache.save_by_date(df.iloc[:3], store_dir, freq="D")
+    df_day = processing.load_time_range(store_dir, "2020-11-04T00Z", "2020-11-05T00Z")
+    assert len(df_day) == 26
@@ -1,7 +1,12 @@
 # Import les modules
 import os
+import json
+import importlib.util
+import threading
 import pytest
 import projet.streaming as stream
+import projet.processing as processing
+import projet.replay as replay
 import projet.projet_utils as utils
 
 
@@ -133,3 +138,310 @@ def test_cred_start_stream():
                 "access_token_secret": "XXX",
             },
         )
+
+
+@pytest.fixture
+def fake_credentials():
+    """Retourne une instance de 'CredentialsClass' avec de fausses clés."""
+    return stream.CredentialsClass(
+        credentials={
+            "consumer_key": "XXX",
+            "consumer_secret": "XXX",
+            "access_token": "XXX",
+            "access_token_secret": "XXX",
+        }
+    )
+
+
+def _status(i):
+    """Retourne un faux tweet tel que reçu du stream."""
+    return (
+        json.dumps({"id": i, "text": "Hello", "in_reply_to_status_id": None}) + "\r\n"
+    )
+
+
+def test_writer_thread(fake_credentials, tmp_path):
+    """Test que le thread d'écriture écrit tous les tweets à la fermeture."""
+    listen = stream.SListener(fake_credentials, path=str(tmp_path) + "/", batch_size=7)
+    for i in range(50):
+        listen.on_data(_status(i))
+    listen.close()
+    assert listen.written == 50 and listen.dropped == 0
+    (path,) = tmp_path.glob("streamer_*.json")
+    ids = [json.loads(line)["id"] for line in open(path) if line.strip()]
+    assert ids == list(range(50))
+
+
+def test_writer_queue_full(fake_credentials, tmp_path):
+    """Test que les tweets sont comptés comme perdus quand la file est pleine."""
+    listen = stream.SListener(fake_credentials, path=str(tmp_path) + "/", queue_size=5)
+    blocked = threading.Event()
+    write_batch = listen._write_batch
+
+    def _slow_write_batch(statuses):
+        blocked.wait()
+        write_batch(statuses)
+
+    listen._write_batch = _slow_write_batch
+    for i in range(20):
+        listen.on_data(_status(i))
+    assert listen.dropped > 0
+    assert listen.queue_depth <= 5
+    blocked.set()
+    listen.close()
+    assert listen.written + listen.dropped == 20
+
+
+def test_writer_error(fake_credentials, tmp_path):
+    """Test qu'une erreur d'écriture est relancée au lieu de bloquer la fermeture."""
+    listen = stream.SListener(fake_credentials, path=str(tmp_path) + "/", queue_size=5)
+    failed = threading.Event()
+
+    def _failing_write_batch(statuses):
+        failed.set()
+        raise OSError("No space left on device")
+
+    listen._write_batch = _failing_write_batch
+    listen.on_data(_status(0))
+    assert failed.wait(5)
+    listen.writer.join(5)
+    assert isinstance(listen.write_error, OSError)
+    with pytest.raises(OSError):
+        listen.on_data(_status(1))
+
+    # La file pleine ne doit pas bloquer `close`
+    for i in range(5):
+        listen.queue.put_nowait(_status(i))
+    errors = []
+
+    def _close():
+        try:
+            listen.close()
+        except OSError as e:
+            errors.append(e)
+
+    closer = threading.Thread(target=_close)
+    closer.start()
+    closer.join(5)
+    assert not closer.is_alive() and len(errors) == 1
+    assert listen.dropped == 6 and listen.written == 0
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        None,
+        "gzip",
+        pytest.param(
+            "zstd",
+            marks=pytest.mark.skipif(
+                importlib.util.find_spec("zstandard") is None,
+                reason="'zstandard' n'est pas installé",
+            ),
+        ),
+    ],
+)
+def test_rotation_compression(fake_credentials, tmp_path, compression):
+    """Test la rotation selon le nombre de tweets et la lecture des fichiers compressés."""
+    listen = stream.SListener(
+        fake_credentials, path=str(tmp_path) + "/", max=10, compression=compression
+    )
+    for i in range(25):
+        listen.on_data(_status(i))
+    listen.close()
+    path_list = processing.folder_to_path_list(str(tmp_path) + "/")
+    assert len(path_list) == 3
+    df = processing.tweet_json_to_df(path_list=path_list)
+    assert sorted(df["id"]) == list(range(25))
+
+
+def test_rotation_bytes(fake_credentials, tmp_path):
+    """Test la rotation selon la taille des fichiers."""
+    size = len(_status(0).encode("utf-8"))
+    listen = stream.SListener(
+        fake_credentials, path=str(tmp_path) + "/", max=0, max_bytes=4 * size
+    )
+    for i in range(10):
+        listen.on_data(_status(i))
+    listen.close()
+    assert len(list(tmp_path.glob("streamer_*.json"))) == 3
+
+
+def test_split_keywords():
+    """Test la répartition des mots entre les connexions."""
+    shards = stream.split_keywords(["a", "b", "c", "d", "e"], 2)
+    assert shards == [["a", "c", "e"], ["b", "d"]]
+    assert stream.split_keywords(["a"], 3) == [["a"], [], []]
+
+
+def test_shard_dedup(fake_credentials, tmp_path):
+    """Test que les tweets reçus par plusieurs connexions ne sont écrits qu'une fois."""
+    listen = stream.SListener(fake_credentials, path=str(tmp_path) + "/", nb=16)
+    dedup = stream.TweetDeduplicator(maxsize=100)
+    stop = threading.Event()
+    shards = [stream.ShardListener(listen, dedup, stop, shard=i) for i in range(2)]
+    for i in range(10):
+        shards[0].on_data(_status(i))
+        shards[1].on_data(_status(i + 5))
+    assert dedup.duplicates == 5
+    assert not stop.is_set()
+
+    # La limite `nb` arrête toutes les connexions
+    assert shards[1].on_data(_status(99)) is False
+    assert stop.is_set()
+    listen.close()
+    assert listen.written == 16
+
+
+def test_shard_errors(fake_credentials, tmp_path, capsys):
+    """Test que les erreurs d'une connexion passent par sa `ReconnectPolicy`."""
+    listen = stream.SListener(fake_credentials, path=str(tmp_path) + "/")
+    policy = stream.ReconnectPolicy(jitter=0)
+    shard = stream.ShardListener(
+        listen, stream.TweetDeduplicator(), threading.Event(), policy=policy
+    )
+    assert shard.on_error(420) is False and shard.last_error == 420
+    assert "420" in capsys.readouterr().err
+    assert policy.delay(policy.classify(shard.last_error)) == 60
+    assert shard.on_timeout() is False and shard.last_error is None
+    shard.on_connect()
+    assert policy.attempts["rate_limit"] == 0 and shard.connections == 1
+    listen.close()
+
+
+def _capture(tmp_path, n):
+    """Enregistre `n` faux tweets dans un fichier et retourne son chemin."""
+    path = tmp_path / "capture.json"
+    with open(path, "w") as fh:
+        for i in range(n):
+            fh.write(_status(i))
+    return str(path)
+
+
+def test_replay_stream(fake_credentials, tmp_path):
+    """Test le rejeu de tweets enregistrés dans un 'SListener'."""
+    capture = _capture(tmp_path, 30)
+    out = tmp_path / "out"
+    out.mkdir()
+    listen = stream.SListener(fake_credentials, path=str(out) + "/", max=10)
+    stats = replay.replay_stream(listen, path_list=[capture])
+    assert stats["tweets"] == 30 and stats["written"] == 30
+    assert stats["files"] == 4 and stats["tweets_per_s"] > 0
+    df = processing.tweet_json_to_df(folder=str(out) + "/")
+    assert sorted(df["id"]) == list(range(30))
+
+
+def test_replay_server(fake_credentials, tmp_path):
+    """Test le rejeu par le serveur local à travers 'tweepy.Stream'."""
+    capture = _capture(tmp_path, 20)
+    out = tmp_path / "out"
+    out.mkdir()
+    listen = stream.SListener(fake_credentials, path=str(out) + "/")
+    with replay.ReplayServer(path_list=[capture]) as server:
+        server.stream(listen).filter(track=["Hello"])
+    listen.close()
+    assert server.sent == 20 and listen.written == 20
+
+
+def test_reconnect_policy():
+    """Test l'attente exponentielle, bornée et séparée par type d'erreur."""
+    policy = stream.ReconnectPolicy(network=(1, 4), rate_limit=(60, 120), seed=0)
+    assert policy.classify(None) == "network"
+    assert policy.classify(420) == policy.classify(429) == "rate_limit"
+    assert policy.classify(503) == "http"
+
+    delays = [policy.delay("network") for _ in range(5)]
+    for delay, expected in zip(delays, [1, 2, 4, 4, 4]):
+        assert expected / 2 <= delay <= expected
+    assert 30 <= policy.delay("rate_limit") <= 60
+    assert policy.errors == {"network": 5, "rate_limit": 1}
+
+    policy.reset()
+    assert policy.delay("network") <= 1
+
+
+def test_start_stream_reconnect(fake_credentials, tmp_path, monkeypatch):
+    """Test que le stream se reconnecte après une erreur en gardant le même fichier."""
+    events = iter(["network", 420, "timeout", "ok", "ok"])
+
+    class _FakeStream:
+        def __init__(self, auth, listener, **options):
+            self.listener = listener
+
+        def filter(self, track):
+            event = next(events)
+            if event == "network":
+                raise ConnectionError("connexion perdue")
+            if event == 420:
+                self.listener.on_error(420)
+                return
+            if event == "timeout":
+                assert self.listener.on_timeout() is False
+                return
+            self.listener.on_connect()
+            for i in range(5):
+                self.listener.on_data(_status(i))
+            self.listener.stream_calls = getattr(self.listener, "stream_calls", 0) + 1
+            if self.listener.stream_calls == 1:
+                raise ConnectionError("connexion coupée")
+
+    monkeypatch.setattr(stream, "PolicyStream", _FakeStream)
+    monkeypatch.setattr(stream.time, "sleep", lambda delay: None)
+    stats = stream.start_stream(
+        ["a"],
+        fake_credentials,
+        nb=8,
+        path=str(tmp_path) + "/",
+        policy=stream.ReconnectPolicy(seed=0),
+    )
+    assert stats["errors"] == {"network": 3, "rate_limit": 1}
+    assert stats["connections"] == 2 and stats["written"] == 8
+    assert stats["downtime"] >= 0
+    assert len(list(tmp_path.glob("streamer_*.json"))) == 1
+
+
+def test_policy_stream_closed(fake_credentials, tmp_path):
+    """Test que le stream rend la main quand Twitter ferme la connexion ou se déconnecte."""
+    listen = stream.SListener(fake_credentials, path=str(tmp_path) + "/")
+    policy_stream = stream.PolicyStream(fake_credentials.auth, listen)
+    policy_stream.running = True
+    policy_stream.on_closed(None)
+    assert not policy_stream.running
+
+    notice = {"disconnect": {"code": 7, "stream_name": "x", "reason": "admin"}}
+    assert listen.on_data(json.dumps(notice)) is False
+    assert listen.last_error is None
+    listen.close()
+
+
+def test_message_type():
+    """Test la classification des messages par leur première clé."""
+    tweet = json.dumps({"created_at": "x", "id": 1, "text": "please delete this limit"})
+    assert stream.message_type(tweet) == "status"
+    assert stream.message_type('{"delete":{"status":{"id":1,"user_id":2}}}') == "delete"
+    assert stream.message_type(' {"limit":{"track":3}}') == "limit"
+    assert stream.message_type("") is None
+
+
+def test_status_filter(fake_credentials, tmp_path):
+    """Test que les tweets filtrés et les messages de contrôle ne sont pas écrits."""
+
+    def _tweet(i, lang, retweet=False):
+        tweet = {"created_at": "x", "id": i, "text": 'delete "lang":"fr"'}
+        if retweet:
+            tweet["retweeted_status"] = {"id": 0, "lang": lang}
+        tweet["lang"] = lang
+        return json.dumps(tweet) + "\r\n"
+
+    keep = stream.make_filter(lang="en", retweets=False)
+    assert stream.make_filter() is None
+    listen = stream.SListener(
+        fake_credentials, path=str(tmp_path) + "/", status_filter=keep
+    )
+    listen.on_data(_tweet(1, "en"))
+    listen.on_data(_tweet(2, "fr"))
+    listen.on_data(_tweet(3, "en", retweet=True))
+    listen.on_data('{"delete":{"status":{"id":1,"user_id":2}}}\r\n')
+    listen.on_data('{"limit":{"track":3}}\r\n')
+    listen.close()
+    assert listen.written == 1 and listen.filtered == 2